@@ -0,0 +1,60 @@
+#!/usr/bin/env python2
+#
+# The _open_SmashBox Project.
+#
+# License: AGPL
+#
+# Benchmark of analyse_hashfiles with a growing number of hashing threads
+# (config.hashfile_verify_workers). The checksum cache is cleared before each
+# run so that every file is hashed; the files are read from the page cache.
+#
+#  python benchmarks/bench_analyse_hashfiles.py [--files 200] [--size 5000000] [--workers 1 2 4 8]
+#
+
+import benchutil
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+benchutil.setup_logging()
+
+from smashbox.utilities import *
+from smashbox.utilities import checksum
+from smashbox.utilities.hash_files import *  # the logger must be set up before the import
+
+
+def main():
+    parser = argparse.ArgumentParser(description='analyse_hashfiles scaling by number of threads')
+    parser.add_argument('--files', type=int, default=200, help='number of hashfiles')
+    parser.add_argument('--size', type=int, default=5000000, help='size of each hashfile (bytes)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='thread counts')
+    parser.add_argument('--dir', default=None, help='scratch directory (default: system tmp)')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='smash-bench-analyse-', dir=args.dir)
+
+    try:
+        for i in range(args.files):
+            create_hashfile(scratch, size=args.size)
+
+        mb = args.files*args.size/1e6
+        print "%d files, %.1f MB, %d cores" % (args.files, mb, multiprocessing.cpu_count())
+
+        t1 = None
+        for n in args.workers:
+            checksum.clear_cache()
+            t0 = time.time()
+            nfiles, nanalysed, ncorrupt = analyse_hashfiles(scratch, nworkers=n)
+            t = time.time() - t0
+            if t1 is None:
+                t1 = t
+            assert nanalysed == args.files and ncorrupt == 0
+            print "workers=%-3d %8.3fs  %8.1f MB/s  speedup %.2f" % (n, t, mb/t, t1/t)
+    finally:
+        remove_tree(scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+#
+# The _open_SmashBox Project.
+#
+# License: AGPL
+#
+# Throughput of the checksum algorithms of the registry (smashbox.utilities.checksum)
+# on one file, each algorithm alone and all of them in one read, and whether each
+# algorithm detects the typical corruptions of synced files: a flipped bit, a zeroed
+# page, swapped, shifted or duplicated blocks and truncation. The checksum cache is
+# cleared before each run; the file is read from the page cache.
+#
+#  python benchmarks/bench_checksums.py [--size 1000] [--algorithms md5 sha1 adler32 crc32]
+#
+
+import benchutil
+
+import argparse
+import tempfile
+import time
+
+benchutil.setup_logging()
+
+from smashbox.utilities import *
+from smashbox.utilities import checksum, seeded_content
+
+
+def corruptions(data):
+    """ Yield (name, corrupted data).
+    """
+    page = seeded_content.PAGE_SIZE
+    block = 64*1024
+    n = len(data)//2
+    yield 'bit flip', data[:n] + chr(ord(data[n]) ^ 1) + data[n+1:]
+    yield 'zeroed page', data[:n] + '\0'*page + data[n+page:]
+    yield 'swapped blocks', data[:block] + data[2*block:3*block] + data[block:2*block] + data[3*block:]
+    yield 'shifted block', data[:block] + data[block+page:2*block+page] + data[2*block+page:]
+    yield 'duplicated block', data[:2*block] + data[:block] + data[3*block:]
+    yield 'truncated', data[:-page]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='checksum algorithms throughput and corruption detection')
+    parser.add_argument('--size', type=int, default=1000, help='file size (MB)')
+    parser.add_argument('--algorithms', nargs='+', default=checksum.algorithms(), help='algorithms of the registry')
+    parser.add_argument('--dir', default=None, help='scratch directory (default: system tmp)')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='smash-bench-checksums-', dir=args.dir)
+
+    try:
+        fn = os.path.join(scratch, 'file')
+        f = open(fn, 'wb')
+        for chunk in seeded_content.generate(seeded_content.new_seed(), 0, args.size*1000*1000, WRITE_SIZE):
+            f.write(chunk)
+        f.close()
+
+        print "%d MB, read size %d" % (args.size, checksum.read_size())
+
+        def run(algorithms):
+            checksum.clear_cache()
+            t0 = time.time()
+            checksum.file_digests(fn, algorithms)
+            return time.time() - t0
+
+        for a in args.algorithms:
+            t = run([a])
+            print "  %-20s %8.3fs  %8.1f MB/s" % (a, t, args.size/t)
+
+        t = run(args.algorithms)
+        print "  %-20s %8.3fs  %8.1f MB/s" % ('all in one read', t, args.size/t)
+
+        print "corruption detection (%s)" % ' '.join(args.algorithms)
+        data = ''.join(seeded_content.generate(seeded_content.new_seed(), 0, 1024*1024))
+        for name, corrupted in corruptions(data):
+            detected = []
+            for a in args.algorithms:
+                h1, h2 = checksum.new(a), checksum.new(a)
+                h1.update(data)
+                h2.update(corrupted)
+                detected.append(h1.hexdigest() != h2.hexdigest() and 'yes' or 'NO')
+            print "  %-20s %s" % (name, ' '.join(detected))
+    finally:
+        remove_tree(scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python2
+#
+# The _open_SmashBox Project.
+#
+# License: AGPL
+#
+# Benchmark of createfile: one write per block (as it used to be done) versus
+# the coalesced writes of smashbox.utilities.createfile, for the block sizes
+# used by the tests (test_basicSync writes 1000 blocks of basicSync_filesizeKB).
+#
+#  python benchmarks/bench_createfile.py [--sizes 500000 2000000] [--count 1000]
+#
+
+import benchutil
+
+import argparse
+import tempfile
+import time
+
+from smashbox.utilities import *
+
+
+def createfile_per_block(fn, c, count, bs):
+    buf = c*bs
+    of = open(fn, 'wb')
+    for i in range(count):
+        of.write(buf)
+    of.close()
+
+
+def timeit(f, *args):
+    t0 = time.time()
+    f(*args)
+    return time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='createfile throughput for the test block sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 500000, 2000000], help='block sizes (bytes)')
+    parser.add_argument('--count', type=int, default=1000, help='number of blocks')
+    parser.add_argument('--dir', default=None, help='scratch directory (default: system tmp)')
+    args = parser.parse_args()
+
+    benchutil.setup_logging()
+
+    scratch = tempfile.mkdtemp(prefix='smash-bench-createfile-', dir=args.dir)
+    fn = os.path.join(scratch, 'file.dat')
+
+    try:
+        for bs in args.sizes:
+            mb = args.count*bs/1e6
+            for name, f in [('per block', createfile_per_block), ('coalesced', createfile)]:
+                t = timeit(f, fn, '0', args.count, bs)
+                print "bs=%-8d count=%-6d %10.1f MB  %-10s %8.3fs  %8.1f MB/s" % (bs, args.count, mb, name, t, mb/t if t else 0)
+                os.remove(fn)
+    finally:
+        remove_tree(scratch)
+
+
+if __name__ == "__main__":
+    main()
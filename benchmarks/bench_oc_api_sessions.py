@@ -0,0 +1,58 @@
+#!/usr/bin/env python2
+#
+# The _open_SmashBox Project.
+#
+# License: AGPL
+#
+# Benchmark of the share operations through the OCS API with and without the
+# session cache (config.oc_api_session_ttl). Needs a test server configured
+# in etc/smashbox.conf (or with -c/-o options, like smash).
+#
+#  python benchmarks/bench_oc_api_sessions.py [--ops 1000] [-o oc_server=...]
+#
+
+import benchutil
+
+import time
+
+from smashbox.utilities import *
+
+
+def share_ops(nops, sharer, sharee, path):
+    """ Run nops share operations (create + delete share) and return the elapsed time.
+    """
+    t0 = time.time()
+    for i in range(nops/2):
+        share_id = share_file_with_user(path, sharer, sharee)
+        fatal_check(share_id > 0, 'share failed (%s)' % share_id)
+        delete_share(sharer, share_id)
+    return time.time() - t0
+
+
+def main():
+    parser = benchutil.arg_parser(description='OCS share operations with and without the API session cache')
+    parser.add_argument('--ops', type=int, default=1000, help='number of share operations (create and delete count as one each)')
+    args = parser.parse_args()
+
+    config = benchutil.configure(args, 'bench_oc_api_sessions')
+    config.oc_account_name = 'smash-bench-sessions'
+
+    sharer = config.oc_account_name
+    sharee = '%s%d' % (config.oc_account_name, 1)
+    path = '/bench-share'
+
+    reset_owncloud_account(reset_procedure='delete', num_test_users=1)
+    webdav_mkcol(path)
+
+    for ttl in [0, 300]:
+        config.oc_api_session_ttl = ttl
+        invalidate_oc_api_session()
+        t = share_ops(args.ops, sharer, sharee, path)
+        print "%5d share operations  session cache %-3s  %8.2fs  %7.1f ops/s" % (args.ops, 'on' if ttl else 'off', t, args.ops/t)
+
+    delete_owncloud_account(sharee)
+    delete_owncloud_account(sharer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python2
+#
+# The _open_SmashBox Project.
+#
+# License: AGPL
+#
+# Benchmark of the checksums of single huge files: the sequential md5 loop
+# (md5sum), the same loop with readahead and the tree digest of the segments
+# hashed by a growing number of threads (tree_md5sum). The checksum cache is
+# cleared before each run. Unless --drop-caches is given (root only) the files
+# are read from the page cache when they fit in memory.
+#
+#  python benchmarks/bench_tree_digest.py [--sizes 1000 2000 5000 10000] [--workers 1 2 4 8]
+#
+
+import benchutil
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+benchutil.setup_logging()
+
+from smashbox.utilities import *
+from smashbox.utilities import checksum
+
+
+def drop_caches():
+    os.system('sync')
+    f = open('/proc/sys/vm/drop_caches', 'w')
+    f.write('3\n')
+    f.close()
+
+
+def measure(label, mb, fn, args):
+    checksum.clear_cache()
+    if args.drop_caches:
+        drop_caches()
+    t0 = time.time()
+    digest = fn()
+    t = time.time() - t0
+    print "  %-20s %8.3fs  %8.1f MB/s  %s" % (label, t, mb/t, digest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='checksums of single huge files')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000, 10000], help='file sizes (MB)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='thread counts of the tree digest')
+    parser.add_argument('--dir', default=None, help='scratch directory (default: system tmp)')
+    parser.add_argument('--drop-caches', action='store_true', default=False, help='drop the page cache before each run')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='smash-bench-tree-', dir=args.dir)
+
+    print "%d cores, segment size %d, read size %d" % (multiprocessing.cpu_count(), checksum.segment_size(),
+                                                       checksum.read_size())
+    try:
+        for size in args.sizes:
+            fn = os.path.join(scratch, 'file_%d' % size)
+            createfile(fn, '0', size, 1000*1000)
+            print "%d MB" % size
+
+            f = open(fn, 'rb', 0)
+            try:
+                measure('md5', size, lambda: checksum.hash_stream(f, 'md5'), args)
+                f.seek(0)
+                measure('md5 readahead', size, lambda: checksum.hash_stream(f, 'md5', readahead=True), args)
+            finally:
+                f.close()
+
+            for n in args.workers:
+                measure('tree workers=%d' % n, size, lambda: checksum.tree_digest(fn, 'md5', nworkers=n), args)
+
+            remove_file(fn)
+    finally:
+        remove_tree(scratch)
+
+
+if __name__ == "__main__":
+    main()
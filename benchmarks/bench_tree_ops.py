@@ -0,0 +1,77 @@
+#!/usr/bin/env python2
+#
+# The _open_SmashBox Project.
+#
+# License: AGPL
+#
+# Benchmark of the basic file and directory operations in smashbox.utilities:
+# create and remove a tree with N entries using the shell (as it used to be
+# done with runcmd) and natively (mkdir/remove_tree), sequentially and with
+# the parallel tree removal.
+#
+#  python benchmarks/bench_tree_ops.py [--entries 10000] [--workers 1 4 8]
+#
+
+import benchutil
+
+import argparse
+import subprocess
+import tempfile
+import time
+
+from smashbox.utilities import *
+
+
+def make_tree(top, nentries, fanout, shell=False):
+    """ Create nentries (directories and files, 1 file per directory) below top.
+    """
+    n = 0
+    ndirs = nentries/2
+    for i in range(ndirs):
+        d = os.path.join(top, 'dir %03d' % (i % fanout), 'sub %06d' % i)
+        if shell:
+            subprocess.check_call("mkdir -p '%s'" % d, shell=True)
+        else:
+            mkdir(d)
+        createfile(os.path.join(d, 'file.dat'), '0', 1, 100)
+        n += 2
+    return n
+
+
+def timeit(f, *args, **kwds):
+    t0 = time.time()
+    f(*args, **kwds)
+    return time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='create and remove N-entry trees')
+    parser.add_argument('--entries', type=int, default=10000, help='number of entries in the tree')
+    parser.add_argument('--fanout', type=int, default=20, help='number of top-level directories')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='thread counts for remove_tree')
+    parser.add_argument('--dir', default=None, help='scratch directory (default: system tmp)')
+    args = parser.parse_args()
+
+    benchutil.setup_logging()
+
+    scratch = tempfile.mkdtemp(prefix='smash-bench-tree-', dir=args.dir)
+
+    try:
+        top = os.path.join(scratch, 'shell')
+        t = timeit(make_tree, top, args.entries, args.fanout, shell=True)
+        print "create %6d entries  mkdir -p via shell    %8.2fs" % (args.entries, t)
+        t = timeit(subprocess.check_call, "rm -rf '%s'" % top, shell=True)
+        print "remove %6d entries  rm -rf via shell      %8.2fs" % (args.entries, t)
+
+        for nworkers in args.workers:
+            top = os.path.join(scratch, 'native%d' % nworkers)
+            t = timeit(make_tree, top, args.entries, args.fanout)
+            print "create %6d entries  mkdir (native)        %8.2fs" % (args.entries, t)
+            t = timeit(remove_tree, top, nworkers=nworkers)
+            print "remove %6d entries  remove_tree nworkers=%-2d %7.2fs" % (args.entries, nworkers, t)
+    finally:
+        remove_tree(scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+
+# common setup of the benchmark scripts
+#
+# the benchmarks which talk to the owncloud server are configured exactly like the smash
+# executable: etc/smashbox.conf plus optional -c config files and -o key=val options
+
+import sys, os.path
+
+topDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(topDir, 'python'))
+
+import logging
+
+
+def setup_logging(level=logging.WARNING):
+    """ Configure logging and make the logger visible to the smashbox utilities.
+    """
+    import smashbox.utilities
+
+    logging.basicConfig(level=level)
+    logger = logging.getLogger()
+    smashbox.utilities.logger = logger
+    return logger
+
+
+def arg_parser(**kwds):
+    """ Return the smash argument parser (-c config, -o key=val, -v, --debug) for the server benchmarks.
+    """
+    import smashbox.script
+    return smashbox.script.arg_parser(**kwds)
+
+
+def configure(args, rundir_name):
+    """ Configure smashbox from the parsed args (like bin/smash) and prepare the run directory.
+    Return the config object.
+    """
+    import smashbox.script
+    import smashbox.utilities
+    import datetime
+
+    config = smashbox.script.configure(args.options, args.configs)
+
+    level = logging.WARNING
+    if args.verbose:
+        level = logging.INFO
+    if args.debug:
+        level = logging.DEBUG
+    setup_logging(level)
+    config._loglevel = level
+
+    if config.oc_server.strip() in ['localhost', '']:
+        import socket
+        config.oc_server = socket.gethostname()
+
+    if not config.runid:
+        config.runid = datetime.datetime.now().strftime("%y%m%d-%H%M%S")
+
+    config.smashdir = os.path.expanduser(config.smashdir)
+    config.rundir = os.path.join(config.smashdir, rundir_name)
+    smashbox.utilities.mkdir(config.rundir)
+
+    return config
@@ -27,6 +27,7 @@ Data Providers:
 """
 
 from smashbox.utilities import *
+from smashbox.utilities.hash_files import count_files_tree
 import re
 
 filesizeKB = int(config.get('test_filesizeKB', 10))
@@ -97,7 +98,7 @@ def uploader(step):
 
     for f in files:
         expect_exists(os.path.join(d, f))
-        expect_webdav_exist(f, user_num=user_num)
+    expect_webdav_exist_many(files, user_num=user_num)
 
     step(5, 'Uploader final step')
 
@@ -120,6 +121,10 @@ def downloader(step):
     for f in files:
         expect_exists(os.path.join(d, f))
 
+    ntotal, per_dir = count_files_tree(d, '*.dat')
+    error_check(ntotal == dir_depth * numFilesToCreate, 'Number of synced files does not match (%d)' % ntotal)
+    error_check(len(per_dir) == dir_depth, 'Number of synced directories does not match (%d)' % len(per_dir))
+
 for u in range(config.oc_number_test_users):
     add_worker(uploader, name="uploader%02d" % (u+1))
     add_worker(downloader, name="downloader%02d" % (u+1))
@@ -57,7 +57,7 @@ testsets = [
 ]
 
 def expect_content(fn,md5):
-    actual_md5 = md5sum(fn)
+    actual_md5 = tree_md5sum(fn)
     error_check(actual_md5 == md5, "inconsistent md5 of %s: expected %s, got %s"%(fn,md5,actual_md5))
 
 def expect_no_deleted_files(d):
@@ -116,7 +116,7 @@ def creator(step):
     createfile(os.path.join(d,'TEST_FILE_DELETED_BOTH.dat'),'0',count=1000,bs=filesizeKB)
 
     shared = reflection.getSharedObject()
-    shared['md5_creator'] = md5sum(os.path.join(d,'TEST_FILE_MODIFIED_NONE.dat'))
+    shared['md5_creator'] = tree_md5sum(os.path.join(d,'TEST_FILE_MODIFIED_NONE.dat'))
     logger.info('md5_creator: %s',shared['md5_creator'])
 
     list_files(d)
@@ -152,7 +152,7 @@ def winner(step):
     createfile(os.path.join(d,'TEST_FILE_ADDED_BOTH.dat'),'1',count=1000,bs=filesizeKB)
 
     shared = reflection.getSharedObject()
-    shared['md5_winner'] = md5sum(os.path.join(d,'TEST_FILE_ADDED_WINNER.dat'))
+    shared['md5_winner'] = tree_md5sum(os.path.join(d,'TEST_FILE_ADDED_WINNER.dat'))
     logger.info('md5_winner: %s',shared['md5_winner'])
 
     run_ocsync(d)
@@ -193,7 +193,7 @@ def loser(step):
     createfile(os.path.join(d,'TEST_FILE_ADDED_BOTH.dat'),'2',count=1000,bs=filesizeKB)
 
     shared = reflection.getSharedObject()
-    shared['md5_loser'] = md5sum(os.path.join(d,'TEST_FILE_ADDED_LOSER.dat'))
+    shared['md5_loser'] = tree_md5sum(os.path.join(d,'TEST_FILE_ADDED_LOSER.dat'))
     logger.info('md5_loser: %s',shared['md5_loser'])
 
 
@@ -66,9 +66,8 @@ def downloader(step):
 
     step(3,'Download and check')
 
-    sleep(1) # avoid race condition reading the file which has yet not been properly closed after writing
-
-    run_ocsync(d)
+    # repeat until nothing changes: the files which are not yet completely uploaded are picked up by the next pass
+    run_ocsync(d,until_quiescent=True)
 
     (ntot,nana,nbad) = analyse_hashfiles(d)
 
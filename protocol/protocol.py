@@ -6,7 +6,7 @@ import smashbox.curl
 import sys,os,os.path,random
 
 # Enable the checksuming functionality test as described in checksum.md
-# The type may be: Adler32 or MD5
+# The type may be: Adler32 or MD5 (or any other type of the registry of smashbox.utilities.checksum, e.g. SHA1)
 CHECKSUM_ENABLED=None
 
 def enable_checksum(cstype):
@@ -15,13 +15,14 @@ def enable_checksum(cstype):
     CHECKSUM_ENABLED=cstype
 
 def compute_checksum(fn):
+    from smashbox.utilities import checksum
     if CHECKSUM_ENABLED:
-        if CHECKSUM_ENABLED == "Adler32":
-            return "Adler32:"+adler32(fn)
-        if CHECKSUM_ENABLED == 'MD5':
-            return "MD5:"+md5sum(fn)
+        algorithm = checksum.from_header_type(CHECKSUM_ENABLED)
+        if algorithm:
+            return "%s:%s"%(checksum.header_type(algorithm),checksum.file_digest(fn,algorithm))
     return None
         
+# the types which the server supports (the other registered types are not tested as unsupported types)
 known_checksum_types = ['MD5','Adler32']
 
 def chunk_file_upload(filename,dest_dir_url,chunk_size=None,header_if_match=None,android_client_bug_900=False,checksum=None):
@@ -9,9 +9,29 @@ class Response:
 import pycurl, cStringIO
 
 class Client:
+    """ A WebDAV client on top of a single pycurl handle.
+
+    The handle (and so the connection cache: keep-alive connections and SSL sessions) is reused by all requests
+    made with the same client. All request options are reset before each request.
+    """
     
     def __init__(self):
-        c = pycurl.Curl()
+        self.c = pycurl.Curl()
+
+        if config.get('pycurl_VERBOSE',None) is not None:
+            self.verbose = config.pycurl_VERBOSE
+        else:
+            from logging import DEBUG
+            self.verbose = config._loglevel <= DEBUG
+
+        self._reset()
+
+    def _reset(self):
+        """ Reset the handle to the default options (live connections are kept).
+        """
+        c = self.c
+
+        c.reset()
 
         c.setopt(c.SSL_VERIFYPEER, 0)
         c.setopt(c.CONNECTTIMEOUT, 60)
@@ -22,25 +42,21 @@ class Client:
         if config.get('pycurl_USERAGENT',None):
             c.setopt(c.USERAGENT, config.pycurl_USERAGENT)
 
-        if config.get('pycurl_VERBOSE',None) is not None:
-            self.verbose = config.pycurl_VERBOSE
-        else:
-            from logging import DEBUG
-            self.verbose = config._loglevel <= DEBUG
-
         c.setopt(c.VERBOSE, self.verbose) 
 
-        self.c = c
-
     def PROPFIND(self,url,query,depth,parse_check=True,headers={}):
         logger.info("PROPFIND %s depth=%s %s query=%s",url,depth,headers,query)
 
+        self._reset()
         c = self.c
 
         c.setopt(c.CUSTOMREQUEST, "PROPFIND")
-        c.setopt(pycurl.HTTPHEADER, ["Depth:%s"%depth,'Expect:'])
         c.setopt(c.UPLOAD,1) 
 
+        headers = dict(headers)
+        headers['Depth'] = depth
+        headers['Expect'] = ''
+
         import StringIO
         c.setopt(c.READFUNCTION,StringIO.StringIO(query).read)
         c.setopt(c.INFILESIZE,len(query))
@@ -66,6 +82,7 @@ class Client:
     def PUT(self,fn,url,headers={},offset=0,size=0):
         logger.debug('PUT %s %s %s',fn,url,headers)
 
+        self._reset()
         c = self.c
 
         c.setopt(c.CUSTOMREQUEST, "PUT")
@@ -97,6 +114,7 @@ class Client:
     def GET(self,url,fn,headers={}):
         logger.debug('GET %s %s %s',url,fn,headers)
 
+        self._reset()
         c = self.c
 
         f = open(fn,'w')
@@ -106,28 +124,46 @@ class Client:
         return r
 
     def MKCOL(self,url):
-        logger.debug('MKCOL %s %s %s',url)
+        logger.debug('MKCOL %s',url)
         
+        self._reset()
         c = self.c
         
         c.setopt(c.CUSTOMREQUEST, "MKCOL")
 
-        r = self._perform_request(url,{})
+        r = Response()
+        r.body_stream = cStringIO.StringIO()
+        c.setopt(c.WRITEFUNCTION,r.body_stream.write)
+
+        return self._perform_request(url,{},response_obj=r)
+
+    def DELETE(self,url):
+        logger.debug('DELETE %s',url)
+
+        self._reset()
+        c = self.c
+
+        c.setopt(c.CUSTOMREQUEST, "DELETE")
+
+        r = Response()
+        r.body_stream = cStringIO.StringIO()
+        c.setopt(c.WRITEFUNCTION,r.body_stream.write)
 
-        return r        
+        return self._perform_request(url,{},response_obj=r)
 
     def MOVE(self,url,destination,overwrite=None):
-        logger.debug
-        
-        print 'MOVE %s %s %s'%(url,destination,overwrite)
+        logger.debug('MOVE %s %s %s',url,destination,overwrite)
+
+        self._reset()
         c = self.c
         
         c.setopt(c.CUSTOMREQUEST, "MOVE")
-        c.setopt(pycurl.HTTPHEADER, ["Destination:%s"%destination])
+
+        headers = {'Destination':destination}
         if overwrite:
-            c.setopt(pycurl.HTTPHEADER, ['Overwrite:%s'%overwrite])
+            headers['Overwrite'] = overwrite
 
-        r = self._perform_request(url,{})
+        r = self._perform_request(url,headers)
 
         return r
 
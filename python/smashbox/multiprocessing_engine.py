@@ -172,6 +172,8 @@ class _smash_:
             step(_smash_.N_STEPS-1,None) # don't print any message
 
             import smashbox.utilities
+            smashbox.utilities.finalize_worker()
+
             if smashbox.utilities.reported_errors:
                logger.error('%s error(s) reported',len(smashbox.utilities.reported_errors))
                import sys
@@ -209,6 +211,9 @@ class _smash_:
             p.start()
             _smash_.all_procs.append(p)
 
+        # started after the workers are forked so that they do not inherit the thread
+        smashbox.utilities.start_server_log_tailer()
+
         _smash_.supervisor(_smash_.steps)
 
         for p in _smash_.all_procs:
@@ -2,7 +2,10 @@ from smashbox.script import config
 
 import os.path
 import datetime
+import re
+import shutil
 import subprocess
+import threading
 import time
 
 # Utilities to be used in the test-cases.
@@ -26,9 +29,10 @@ def setup_test():
     If exception is raised then the testcase execution is aborted and smashbox terminates with non-zero exit code,
 
     """
-    reset_owncloud_account(num_test_users=config.oc_number_test_users)
     reset_rundir()
+    reset_owncloud_account(num_test_users=config.oc_number_test_users)
     reset_server_log_file()
+    setup_workload_seed()
     
 
 def finalize_test():
@@ -42,10 +46,43 @@ def finalize_test():
     If exception is raised then smashbox terminates with non-zero exit code,
     """
     d = make_workdir()
+    stop_server_log_tailer()
     scrape_log_file(d)
+    release_owncloud_account()
+    report_server_shell_stats()
+
+def finalize_worker():
+    """ Finalize hooks run in each worker after the worker function returned (or failed).
+    """
+    record_workload()
 
 ######### HELPERS
 
+def setup_workload_seed():
+    """ Set the seed of the run from which the workers derive the seeds of their file size streams (see workload).
+    """
+    from smashbox.utilities import workload
+    workload.setup_run_seed()
+
+def record_workload():
+    """ Record the seeds and the histograms of the file sizes used by this worker (see workload).
+    """
+    from smashbox.utilities import workload
+    workload.record_workload()
+
+def report_server_shell_stats():
+    """ Log and record the latency of the commands run in the server shell channels (see server_shell).
+    """
+    from smashbox.utilities import server_shell
+
+    stats = server_shell.channel_stats()
+    for shell_cmd, s in stats.items():
+        if s['ncommands']:
+            logger.info('server shell %s: %d commands, mean %.3fs, max %.3fs, connect %.3fs', repr(shell_cmd), s['ncommands'], s['mean'], s['max'], s['connect'])
+    if stats:
+        record_result('server_shell', stats)
+
+
 def reset_owncloud_account(reset_procedure=None, num_test_users=None):
     """ 
     Prepare the test account on the owncloud server (remote state). Run this once at the beginning of the test.
@@ -57,6 +94,10 @@ def reset_owncloud_account(reset_procedure=None, num_test_users=None):
 
     If reset_procedure is set to 'keep' than the account is not deleted, so the state from the previous run is kept.
 
+    If reset_procedure is set to 'pool' then a pre-provisioned account is leased from the account pool (see
+    smashbox.utilities.account_pool), its content is wiped and it becomes the test account (config.oc_account_name).
+    The account is returned to the pool by release_owncloud_account() in finalize_test().
+
     """
     if reset_procedure is None:
         reset_procedure = config.oc_account_reset_procedure
@@ -68,19 +109,26 @@ def reset_owncloud_account(reset_procedure=None, num_test_users=None):
         logger.info('reset_owncloud_account (%s) for %d users', reset_procedure, num_test_users)
 
     if reset_procedure == 'delete':
-        delete_owncloud_account(config.oc_account_name)
-        create_owncloud_account(config.oc_account_name, config.oc_account_password)
-        login_owncloud_account(config.oc_account_name, config.oc_account_password)
+        from smashbox.utilities import provisioning
+
+        usernames = [config.oc_account_name]
 
         if num_test_users is not None:
             for i in range(1, num_test_users + 1):
-                username = "%s%i" % (config.oc_account_name, i)
-                delete_owncloud_account(username)
-                create_owncloud_account(username, config.oc_account_password)
-                login_owncloud_account(username, config.oc_account_password)
+                usernames.append("%s%i" % (config.oc_account_name, i))
+
+        # users are deleted, created and logged in by a pool of threads (see oc_provisioning_workers)
+        provisioning.provision_users(usernames, config.oc_account_password)
 
         return
 
+    if reset_procedure == 'pool':
+        from smashbox.utilities import account_pool
+
+        entry = account_pool.lease_account(num_test_users)
+        account_pool.use_leased_account(entry)
+        return
+
     if reset_procedure == 'webdav_delete':
         webdav_delete('/') # delete the complete webdav endpoint associated with the remote account
         webdav_delete('/') # FIXME: workaround current bug in EOS (https://savannah.cern.ch/bugs/index.php?104661) 
@@ -89,6 +137,17 @@ def reset_owncloud_account(reset_procedure=None, num_test_users=None):
     webdav_mkcol('/')
 
 
+def release_owncloud_account():
+    """ Return the test account leased from the account pool (if any) back to the pool.
+    """
+    name = config.get('_oc_account_pool_lease',None)
+    if name:
+        from smashbox.utilities import account_pool
+
+        account_pool.release_account(name)
+        config._oc_account_pool_lease = None
+
+
 def reset_rundir(reset_procedure=None):
     """ Prepare the run directory for the current test (local state). Run this once at the beginning of the test.
 
@@ -141,8 +200,7 @@ def create_owncloud_account(username=None, password=None):
 
     logger.info('Creating user %s with password %s', username, password)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     oc_api.create_user(username, password)
 
 
@@ -160,8 +218,9 @@ def login_owncloud_account(username=None, password=None):
 
     logger.info('Logging in user %s with password %s', username, password)
 
-    oc_api = get_oc_api()
-    oc_api.login(username, password)
+    # always a real login (the cached session is replaced)
+    invalidate_oc_api_session(username)
+    get_oc_api_session(username, password)
 
 def delete_owncloud_account(username):
     """ Deletes a user account on the server
@@ -171,9 +230,9 @@ def delete_owncloud_account(username):
     """
     logger.info('Deleting user %s', username)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     oc_api.delete_user(username)
+    invalidate_oc_api_session(username)
 
 
 def check_owncloud_account(username):
@@ -184,8 +243,7 @@ def check_owncloud_account(username):
     """
     logger.info('Checking if user %s exists', username)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     exists = oc_api.user_exists(username)
     return exists
 
@@ -203,10 +261,10 @@ def reset_owncloud_group(num_groups=None):
     if num_groups is None:
         num_groups = config.oc_number_test_groups
 
-    for i in range(1, num_groups + 1):
-        group_name = "%s%i" % (config.oc_group_name, i)
-        delete_owncloud_group(group_name)
-        create_owncloud_group(group_name)
+    from smashbox.utilities import provisioning
+
+    group_names = ["%s%i" % (config.oc_group_name, i) for i in range(1, num_groups + 1)]
+    provisioning.provision_groups(group_names)
 
 
 def check_owncloud_group(group_name):
@@ -217,8 +275,7 @@ def check_owncloud_group(group_name):
     """
     logger.info('Checking if group %s exists', group_name)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     exists = oc_api.group_exists(group_name)
     return exists
 
@@ -231,8 +288,7 @@ def delete_owncloud_group(group_name):
     """
     logger.info('Deleting group %s', group_name)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     oc_api.delete_group(group_name)
 
 
@@ -244,8 +300,7 @@ def create_owncloud_group(group_name):
     """
     logger.info('Creating group %s', group_name)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     oc_api.create_group(group_name)
 
 
@@ -282,75 +337,429 @@ def oc_webdav_url(protocol='http',remote_folder="",user_num=None,webdav_endpoint
 # this is a local variable for each worker that keeps track of the repeat count for the current step
 ocsync_cnt = {}
 
+ocsync_cnt_lock = threading.Lock() # run_ocsync_many() runs several syncs of the same worker in threads
+
+
+def _ocsync_log_file(current_step):
+    """ Return the name of the log file for the next ocsync run of this worker in current_step.
+    """
+    from smashbox.utilities import reflection
+
+    with ocsync_cnt_lock:
+        ocsync_cnt.setdefault(current_step,0)
+        log_file = config.rundir+"/%s-ocsync.step%02d.cnt%03d.log"%(reflection.getProcessName(),current_step,ocsync_cnt[current_step])
+        ocsync_cnt[current_step]+=1
+    return log_file
+
 
-def run_ocsync(local_folder, remote_folder="", n=None, user_num=None):
+def _run_ocsync_once(local_folder, remote_folder, user_num, log_file):
+    """ Run the ocsync once and return its metrics.
+    """
+    from smashbox.utilities import ocsync_log
+
+    t0 = datetime.datetime.now()
+    cmd = config.oc_sync_cmd+' '+local_folder+' '+oc_webdav_url('owncloud',remote_folder,user_num)
+    returncode,stdout,stderr = runcmd(cmd, ignore_exitcode=True, log_file=log_file, timeout=config.get('oc_sync_timeout',None))  # exitcode of ocsync is not reliable
+    elapsed = datetime.datetime.now()-t0
+    logger.info('sync cmd is: %s',cmd)
+    logger.info('sync finished: %s',elapsed)
+
+    metrics = ocsync_log.parse_ocsync_log(log_file,local_folder)
+    ocsync_log.throughput(metrics,elapsed.total_seconds())
+    metrics.update({'local_folder':local_folder,'remote_folder':remote_folder,'user_num':user_num,'returncode':returncode,'log_file':os.path.basename(log_file)})
+    logger.info('sync metrics: up %(files_up)d files %(bytes_up)d bytes, down %(files_down)d files %(bytes_down)d bytes, '
+                'discovery %(discovery_ms)d ms, propagation %(propagation_ms)d ms, errors %(errors)d, retries %(retries)d, '
+                '%(mb_per_s).2f MB/s, %(files_per_s).2f files/s',metrics)
+    record_result('ocsync',metrics)
+    return metrics
+
+
+def run_ocsync(local_folder, remote_folder="", n=None, user_num=None, until_quiescent=None):
     """ Run the ocsync for local_folder against remote_folder (or the main folder on the owncloud account if remote_folder is None).
     Repeat the sync n times. If n given then n -> config.oc_sync_repeat (default 1).
+
+    If until_quiescent is True (default config.oc_sync_until_quiescent) then after the n syncs the sync is repeated
+    until the local tree and the remote ETag of the folder do not change during a sync (see _sync_until_quiescent).
+
+    Return the list of metrics of each sync run (see smashbox.utilities.ocsync_log) parsed from the client logs.
+    The metrics are also recorded in the run results (see record_result).
     """
-    global ocsync_cnt
     from smashbox.utilities import reflection
 
     if n is None:
         n = config.oc_sync_repeat
 
-    current_step = reflection.getCurrentStep()
+    if until_quiescent is None:
+        until_quiescent = config.get('oc_sync_until_quiescent', False)
 
-    ocsync_cnt.setdefault(current_step,0)
+    current_step = reflection.getCurrentStep()
 
     local_folder += '/' # FIXME: HACK - is a trailing slash really needed by 1.6 owncloudcmd client?
 
+    if until_quiescent:
+        return _sync_until_quiescent(local_folder,remote_folder,user_num,current_step,n)
+
+    all_metrics = []
+
     for i in range(n):
-        t0 = datetime.datetime.now()
-        cmd = config.oc_sync_cmd+' '+local_folder+' '+oc_webdav_url('owncloud',remote_folder,user_num) + " >> "+config.rundir+"/%s-ocsync.step%02d.cnt%03d.log 2>&1"%(reflection.getProcessName(),current_step,ocsync_cnt[current_step])
-        runcmd(cmd, ignore_exitcode=True)  # exitcode of ocsync is not reliable
-        logger.info('sync cmd is: %s',cmd)
-        logger.info('sync finished: %s',datetime.datetime.now()-t0)
-        ocsync_cnt[current_step]+=1
+        all_metrics.append(_run_ocsync_once(local_folder,remote_folder,user_num,_ocsync_log_file(current_step)))
+
+    return all_metrics
+
+
+# files of the sync client in the local folder which change with every sync
+_sync_client_files = re.compile(r'^(\.csync_journal\.db.*|\._sync_.*\.db.*|\.sync_.*\.db.*|\.owncloudsync\.log)$')
+
+def _sync_state(local_folder, remote_folder, user_num):
+    """ Return the state of the synced folder: the local tree manifest and the remote ETag of the folder.
+    """
+    from smashbox.utilities import manifest
+
+    local = manifest.snapshot(local_folder)
+    for p in local.keys():
+        if _sync_client_files.match(os.path.basename(p)):
+            del local[p]
+
+    rc,responses = webdav_propfind(remote_folder, depth=0, user_num=user_num)
+    etag = None
+    if responses:
+        etag = responses[0][1].get('{DAV:}getetag')
+
+    return local,etag
+
+
+def _sync_until_quiescent(local_folder, remote_folder, user_num, current_step, min_passes=1):
+    """ Run at least min_passes syncs and then repeat the sync until the state of the folder (see _sync_state) does
+    not change during a sync, at most config.oc_sync_max_passes times in total (default 10) and while the time
+    spent is below config.oc_sync_quiescence_timeout seconds (default 600).
+
+    Return the list of metrics of each sync. The number of passes needed is logged and recorded in the run results.
+    """
+    max_passes = int(config.get('oc_sync_max_passes',10))
+    timeout = float(config.get('oc_sync_quiescence_timeout',600))
+
+    t0 = time.time()
+    all_metrics = []
+    converged = False
+
+    state = _sync_state(local_folder,remote_folder,user_num)
+
+    while True:
+        all_metrics.append(_run_ocsync_once(local_folder,remote_folder,user_num,_ocsync_log_file(current_step)))
+
+        new_state = _sync_state(local_folder,remote_folder,user_num)
+        if new_state == state and len(all_metrics) >= min_passes:
+            converged = True
+            break
+        state = new_state
+
+        if len(all_metrics) >= max(max_passes,min_passes):
+            logger.warning('sync of %s not quiescent after %d passes',local_folder,len(all_metrics))
+            break
+        if time.time()-t0 > timeout:
+            logger.warning('sync of %s not quiescent after %.1fs (%d passes)',local_folder,time.time()-t0,len(all_metrics))
+            break
+
+    result = {'local_folder':local_folder,'remote_folder':remote_folder,'user_num':user_num,'passes':len(all_metrics),
+              'converged':converged,'elapsed':time.time()-t0}
+    logger.info('sync of %(local_folder)s: %(passes)d passes in %(elapsed).1fs, converged: %(converged)s',result)
+    record_result('ocsync_quiescence',result)
+
+    return all_metrics
+
+
+def run_ocsync_many(syncs, n=None, max_parallel=None):
+    """ Run the ocsync for several folders at the same time, e.g. to emulate a user with several sync folders
+    or many sync clients in one worker.
+
+    The syncs is a list of (local_folder, remote_folder, user_num) tuples. At most max_parallel syncs run
+    at the same time (if None then config.oc_sync_max_parallel applies, default 8). Each folder is synced
+    n times in a row (if None then config.oc_sync_repeat applies).
+
+    Block until all syncs are finished and return the list of metrics of the last sync of each folder (in the order of syncs,
+    None for a folder which was not synced because n is 0). The repeated syncs of a folder are there to let it settle: the
+    last one shows the state reached, the metrics of every sync are recorded anyway (see _run_ocsync_once).
+    The metrics include the timing ('elapsed') and the exit status ('returncode') of each sync.
+    """
+    from smashbox.utilities import reflection
+    from multiprocessing.pool import ThreadPool
+
+    if n is None:
+        n = config.oc_sync_repeat
+
+    if max_parallel is None:
+        max_parallel = int(config.get('oc_sync_max_parallel',8))
+
+    current_step = reflection.getCurrentStep()
+
+    logger.info('run_ocsync_many: %d folders, max_parallel=%d',len(syncs),max_parallel)
+
+    def _sync(args):
+        local_folder,remote_folder,user_num = args
+        local_folder += '/' # see run_ocsync()
+        metrics = None
+        for i in range(n):
+            metrics = _run_ocsync_once(local_folder,remote_folder,user_num,_ocsync_log_file(current_step))
+        return metrics
+
+    t0 = time.time()
+    pool = ThreadPool(max(1,min(max_parallel,len(syncs))))
+    try:
+        all_metrics = pool.map(_sync,syncs,chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.time()-t0
+
+    nfailed = len([m for m in all_metrics if m is not None and m['returncode'] != 0])
+    logger.info('run_ocsync_many finished: %d folders in %.2fs, %d non-zero exit codes',len(syncs),elapsed,nfailed)
+    record_result('ocsync_many',{'nfolders':len(syncs),'max_parallel':max_parallel,'elapsed':elapsed,'nfailed':nfailed})
+
+    return all_metrics
+
+
+# a per-process (and per-thread) WebDAV client: the connection to the server is kept alive between the requests
+_webdav_clients = threading.local()
+
+def get_webdav_client():
+    """ Return the smashbox.curl.Client of this process and thread (created on first use).
+    """
+    import smashbox.curl
+
+    if getattr(_webdav_clients,'pid',None) != os.getpid(): # do not share the connections with the forking parent
+        _webdav_clients.pid = os.getpid()
+        _webdav_clients.client = smashbox.curl.Client()
+
+    return _webdav_clients.client
+
+
+def _webdav_quote(path):
+    import urllib
+    if isinstance(path,unicode):
+        path = path.encode('utf-8')
+    return urllib.quote(path)
+
+
+# properties requested by the PROPFIND helpers below
+_propfind_query = '<?xml version="1.0" encoding="utf-8"?><d:propfind xmlns:d="DAV:"><d:prop><d:resourcetype/><d:getetag/><d:getcontentlength/><d:getlastmodified/></d:prop></d:propfind>'
+
+def webdav_propfind(path, depth=0, user_num=None):
+    """ PROPFIND path on the server and return (rc,responses).
+
+    The responses is a list of (name,props) where the name is the decoded href and props is the dict of properties
+    found ("200 OK" propstat) or None if the request failed (e.g. rc=404 if path does not exist).
+    """
+    import urllib
+    import smashbox.curl
+
+    client = get_webdav_client()
+    r = client.PROPFIND(oc_webdav_url(remote_folder=_webdav_quote(path), user_num=user_num),_propfind_query,depth,parse_check=False)
+
+    if r.rc != 207:
+        return r.rc,None
+
+    responses = []
+    for href,propstats in smashbox.curl._parse_propfind_response(r.body_stream.getvalue(),depth=depth):
+        props = {}
+        for status,p in propstats.items():
+            if ' 200 ' in status:
+                props = p
+        responses.append((urllib.unquote(href),props))
+    return r.rc,responses
+
+
+def webdav_ls(path, user_num=None):
+    """ Return the dict of names (and their properties) of the children of the remote path with one Depth:1 PROPFIND
+    or None if the path does not exist.
+    """
+    rc,responses = webdav_propfind(path, depth=1, user_num=user_num)
+
+    if responses is None:
+        return None
+
+    # the requested collection is the response with the shortest href, all others are its children
+    hrefs = [href.rstrip('/') for href,props in responses]
+    parent = min(hrefs,key=len)
+
+    children = {}
+    for href,(_,props) in zip(hrefs,responses):
+        if href != parent:
+            children[href.split('/')[-1]] = props
+    return children
 
 
 def webdav_propfind_ls(path, user_num=None):
-    runcmd('curl -s -k %s -XPROPFIND %s | xmllint --format -'%(config.get('curl_opts',''),oc_webdav_url(remote_folder=path, user_num=user_num)))
+    children = webdav_ls(path, user_num=user_num)
+    if children is None:
+        logger.info('%s: not found',path)
+    else:
+        logger.info('%s: %s',path,' '.join(sorted(children.keys())))
+    return children
 
 def expect_webdav_does_not_exist(path, user_num=None):
-    exitcode,stdout,stderr = runcmd('curl -s -k %s -XPROPFIND %s | xmllint --format - | grep NotFound | wc -l'%(config.get('curl_opts',''),oc_webdav_url(remote_folder=path, user_num=user_num)))
-    not_exists = stdout.rstrip() == "1"
-    error_check(not_exists, "Remote path does not %s exist but should" % path)
+    rc,responses = webdav_propfind(path, user_num=user_num)
+    error_check(rc == 404, "Remote path %s exists but should not (rc=%s)" % (path,rc))
 
 def expect_webdav_exist(path, user_num=None):
-    exitcode,stdout,stderr = runcmd('curl -s -k %s -XPROPFIND %s | xmllint --format - | grep NotFound | wc -l'%(config.get('curl_opts',''),oc_webdav_url(remote_folder=path, user_num=user_num)))
-    exists = stdout.rstrip() == "0"
-    error_check(exists, "Remote path %s exists but should not" % path)
+    rc,responses = webdav_propfind(path, user_num=user_num)
+    error_check(rc == 207, "Remote path %s does not exist but should (rc=%s)" % (path,rc))
+
+def _webdav_check_many(paths, user_num, exist):
+    """ Check the existence of many remote paths with one Depth:1 PROPFIND per parent directory.
+    Return the list of paths which failed the check.
+    """
+    import posixpath
+
+    bydir = {}
+    for path in paths:
+        p = path.strip('/')
+        bydir.setdefault(posixpath.dirname(p),[]).append((path,posixpath.basename(p)))
+
+    failed = []
+    for d in sorted(bydir.keys()):
+        children = webdav_ls(d, user_num=user_num)
+        if children is None:
+            children = {}
+        for path,name in bydir[d]:
+            if isinstance(name,unicode):
+                name = name.encode('utf-8')
+            if (name in children) != exist:
+                failed.append(path)
+
+    logger.info('checked %d remote paths in %d directories: %d %s',len(paths),len(bydir),len(failed),'missing' if exist else 'found but should not exist')
+    return failed
+
+def expect_webdav_exist_many(paths, user_num=None):
+    """ Check that all remote paths exist (one PROPFIND request per directory).
+    """
+    for path in _webdav_check_many(paths, user_num, exist=True):
+        error_check(False, "Remote path %s does not exist but should" % path)
+
+def expect_webdav_does_not_exist_many(paths, user_num=None):
+    """ Check that none of the remote paths exist (one PROPFIND request per directory).
+    """
+    for path in _webdav_check_many(paths, user_num, exist=False):
+        error_check(False, "Remote path %s exists but should not" % path)
 
 def webdav_delete(path, user_num=None):
-    runcmd('curl -k %s -X DELETE %s '%(config.get('curl_opts',''),oc_webdav_url(remote_folder=path, user_num=user_num)))
+    r = get_webdav_client().DELETE(oc_webdav_url(remote_folder=_webdav_quote(path), user_num=user_num))
+    logger.info('DELETE %s: rc=%s',path,r.rc)
+    return r.rc
 
 def webdav_mkcol(path, silent=False, user_num=None):
-    out=""
-    if silent: # a workaround for super-verbose errors in case directory on the server already exists
-        out = "> /dev/null 2>&1"
-    runcmd('curl -k %s -X MKCOL %s %s'%(config.get('curl_opts',''),oc_webdav_url(remote_folder=path, user_num=user_num),out))
+    r = get_webdav_client().MKCOL(oc_webdav_url(remote_folder=_webdav_quote(path), user_num=user_num))
+    if not silent or r.rc == 201: # silent is a workaround for super-verbose errors in case directory on the server already exists
+        logger.info('MKCOL %s: rc=%s',path,r.rc)
+    return r.rc
 
 # #### SHELL COMMANDS AND TIME FUNCTIONS
 
-def runcmd(cmd,ignore_exitcode=False,echo=True,allow_stderr=True,shell=True,log_warning=True):
+def runcmd(cmd,ignore_exitcode=False,echo=True,allow_stderr=True,shell=True,log_warning=True,timeout=None,log_file=None,tail_lines=None):
+    """ Run cmd and return (returncode,stdout,stderr).
+
+    The output of the child is streamed line by line as it arrives: to
+    the logger (if echo) or appended to log_file (if given). Only the
+    last tail_lines lines of each stream are kept in memory and
+    returned (default config.runcmd_tail_lines), so verbose commands
+    do not blow up the memory.
+
+    If timeout (seconds, default config.runcmd_timeout) expires then
+    the whole process group of the command is killed and the command
+    is treated as failed.
+    """
+    import collections
+    import signal
+    import threading
+
+    if timeout is None:
+        timeout = config.get('runcmd_timeout',None)
+
+    if tail_lines is None:
+        tail_lines = int(config.get('runcmd_tail_lines',1000))
+
     logger.info('running %s', repr(cmd))
 
-    process = subprocess.Popen(cmd, shell=shell,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-    stdout,stderr = process.communicate()
+    # a separate process group allows to kill the shell together with all its children on timeout
+    preexec_fn = None
+    if timeout:
+        preexec_fn = os.setpgrp
+
+    process = subprocess.Popen(cmd, shell=shell,stdout=subprocess.PIPE,stderr=subprocess.PIPE,preexec_fn=preexec_fn)
+
+    log_lock = threading.Lock()
 
-    if echo:
-        if stdout.strip():
-            logger.info("stdout: %s",stdout)
-        if stderr.strip():
-            if allow_stderr:
-                logger.info("stderr: %s",stderr)
+    if log_file:
+        logf = open(log_file,'a')
+    else:
+        logf = None
+
+    def _reader(stream,tail,name):
+        for line in iter(stream.readline,''):
+            tail.append(line)
+            if logf:
+                with log_lock:
+                    logf.write(line)
+            elif echo and line.strip():
+                if name == 'stderr' and not allow_stderr:
+                    logger.error("%s: %s",name,line.rstrip('\n'))
+                else:
+                    logger.info("%s: %s",name,line.rstrip('\n'))
+        stream.close()
+
+    stdout_tail = collections.deque(maxlen=tail_lines)
+    stderr_tail = collections.deque(maxlen=tail_lines)
+
+    readers = [threading.Thread(target=_reader,args=(process.stdout,stdout_tail,'stdout')),
+               threading.Thread(target=_reader,args=(process.stderr,stderr_tail,'stderr'))]
+
+    for t in readers:
+        t.daemon = True
+        t.start()
+
+    timed_out = False
+
+    if timeout:
+        deadline = time.time()+timeout
+        for t in readers:
+            t.join(max(0,deadline-time.time()))
+        if any(t.is_alive() for t in readers) or process.poll() is None:
+            # give the process a chance to exit after closing its output
+            while process.poll() is None and time.time() < deadline:
+                time.sleep(0.01)
+            if process.poll() is None:
+                timed_out = True
+                logger.error('timeout after %ss, killing process group of command %s',timeout,repr(cmd))
             else:
-                logger.error("stderr: %s",stderr)
+                # the command exited but its background children still hold the output
+                logger.warning('timeout after %ss, killing the background processes of command %s',timeout,repr(cmd))
+            try:
+                os.killpg(process.pid,signal.SIGKILL)
+            except OSError:
+                pass
+            # a child which left the process group may keep the output open: do not wait for it
+            for t in readers:
+                t.join(1)
+    else:
+        for t in readers:
+            t.join()
+
+    process.wait()
+
+    if logf:
+        logf.close()
+
+    stdout = ''.join(stdout_tail)
+    stderr = ''.join(stderr_tail)
 
     if process.returncode != 0:
-        msg = "Non-zero exit code %d from command %s" % (ignore_exitcode,repr(cmd))
+        if timed_out:
+            msg = "Timeout (%ss) of command %s" % (timeout,repr(cmd))
+        else:
+            msg = "Non-zero exit code %d from command %s" % (process.returncode,repr(cmd))
         if log_warning:
             logger.warning(msg)
+            if not echo and stderr.strip():
+                logger.warning("stderr (last %d lines): %s",len(stderr_tail),stderr)
         if not ignore_exitcode:
             raise subprocess.CalledProcessError(process.returncode,cmd)
 
@@ -364,13 +773,81 @@ def sleep(n):
 
 ######## BASIC FILE AND DIRECTORY OPERATIONS
 
+# these are implemented with native os/shutil calls: no shell is forked and
+# filenames with spaces, quotes or unicode characters need no escaping
+
 def mkdir(d):
-    runcmd('mkdir -p '+d)
+    logger.info('mkdir %s',d)
+    try:
+        os.makedirs(d)
+    except OSError,x:
+        import errno
+        if not (x.errno == errno.EEXIST and os.path.isdir(d)):
+            raise
     return d
 
 
-def remove_tree(path):
-    runcmd('rm -rf '+path)
+def remove_tree(path,nworkers=None):
+    """ Remove the directory tree at path (like rm -rf). Missing path is not an error.
+
+    If nworkers > 1 then the subtrees are removed in parallel by a pool
+    of threads (unlink/rmdir release the GIL). This pays off for
+    multi-GB run directories with many worker directories. If nworkers is None
+    then config.remove_tree_workers applies (default 1).
+    """
+    if nworkers is None:
+        nworkers = int(config.get('remove_tree_workers',1))
+
+    logger.info('remove_tree %s (nworkers=%d)',path,nworkers)
+
+    if not os.path.lexists(path):
+        return
+
+    if os.path.islink(path) or not os.path.isdir(path):
+        os.remove(path)
+        return
+
+    if nworkers > 1:
+        _remove_tree_parallel(path,nworkers)
+
+    shutil.rmtree(path)
+
+
+def _remove_tree_parallel(path,nworkers):
+    """ Remove the content of the path directory with a pool of nworkers threads.
+
+    The top-level directories are split into their children until there
+    are enough independent subtrees to keep all threads busy. The
+    (now empty) directory skeleton is left for the final rmtree.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    def _remove(p):
+        if os.path.isdir(p) and not os.path.islink(p):
+            shutil.rmtree(p)
+        else:
+            os.remove(p)
+
+    dirs = [path]
+    tasks = []
+    while dirs and len(tasks)+len(dirs) < 4*nworkers:
+        next_dirs = []
+        for d in dirs:
+            for name in os.listdir(d):
+                p = os.path.join(d,name)
+                if os.path.isdir(p) and not os.path.islink(p):
+                    next_dirs.append(p)
+                else:
+                    tasks.append(p)
+        dirs = next_dirs
+    tasks += dirs
+
+    pool = ThreadPool(nworkers)
+    try:
+        pool.map(_remove,tasks,chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
 
 
 def remove_file(path):
@@ -386,36 +863,96 @@ def remove_file(path):
             raise
 
 def mv(a,b):
-    runcmd('mv %s %s'%(a,b))
+    logger.info('mv %s %s',a,b)
+    shutil.move(a,b)
 
 
-def list_files(path,recursive=False):
-    if platform.system() == 'Darwin':
-        opts = ""
+def _filemode(mode):
+    """ Convert st_mode to the -rwxrwxrwx string as shown by ls -l.
+    """
+    import stat
+
+    if stat.S_ISDIR(mode):
+        s = 'd'
+    elif stat.S_ISLNK(mode):
+        s = 'l'
     else:
-        opts = "--full-time"
+        s = '-'
+
+    for who in ['USR','GRP','OTH']:
+        for what in ['R','W','X']:
+            if mode & getattr(stat,'S_I%s%s'%(what,who)):
+                s += what.lower()
+            else:
+                s += '-'
+    return s
+
+
+def list_files(path,recursive=False):
+    """ Log the directory listing of path (like ls -l, or ls -lR if recursive).
+    """
+    logger.info('list_files %s recursive=%s',path,recursive)
+
+    def _entry(p,name):
+        st = os.lstat(p)
+        mtime = datetime.datetime.fromtimestamp(st.st_mtime)
+        return '%s %12d %s %s'%(_filemode(st.st_mode),st.st_size,mtime.isoformat(' '),name)
+
+    def _listing(d):
+        lines = []
+        for name in sorted(os.listdir(d)):
+            try:
+                lines.append(_entry(os.path.join(d,name),name))
+            except OSError,x:
+                logger.warning(x)
+        return lines
+
+    if not os.path.isdir(path):
+        logger.info("stdout: %s",_entry(path,path))
+        return
 
     if recursive:
-        runcmd('ls -lR %s %s'%(opts,path))
+        out = []
+        for d,dirnames,filenames in os.walk(path):
+            dirnames.sort()
+            out.append('%s:'%d)
+            out.extend(_listing(d))
+            out.append('')
+        logger.info("stdout: %s",'\n'.join(out))
     else:
-        runcmd('ls -lh %s %s'%(opts,path))
+        logger.info("stdout: %s",'\n'.join(_listing(path)))
 
 
 # ## DATA FILES AND VERSIONS
 
+# size of the buffer used to write the content of createfile/modify_file
+WRITE_SIZE = 8*1024*1024
+
+def _write_repeated(of,c,count,bs):
+    """ Write count blocks of c*bs bytes to the open file with few large writes (multiples of the block).
+    """
+    buf = c*bs
+    if not buf or not count:
+        return
+    nbuf = max(1,min(count,WRITE_SIZE//len(buf)))
+    chunk = buf*nbuf
+    for i in range(count//nbuf):
+        of.write(chunk)
+    of.write(buf*(count%nbuf))
+
+
 def createfile(fn,c,count,bs):
     # this replaces the dd as 1) more portable, 2) not prone to problems with escaping funny filenames in shell commands
     logger.info('createfile %s character=%s count=%d bs=%d',fn,repr(c),count,bs)
-    buf = c*bs
-    of = file(fn,'w')
-    for i in range(count):
-        of.write(buf)
-    of.close()
+    of = open(fn,'wb')
+    try:
+        _write_repeated(of,c,count,bs)
+    finally:
+        of.close()
 
 
 def modify_file(fn,c,count,bs):
     logger.info('modify_file %s character=%s count=%d bs=%d',fn,repr(c),count,bs)
-    buf = c*bs
 
     if not os.path.exists(fn):
         message = fn + ' does not exist'
@@ -429,12 +966,12 @@ def modify_file(fn,c,count,bs):
         reported_errors.append(message)
         return
 
-    of = open(fn, 'a')
-    of.seek(0,2)
-    for i in range(count):
-        logger.info('modify_file: appending ')
-        of.write(buf)
-    of.close()
+    of = open(fn, 'ab')
+    try:
+        of.seek(0,2)
+        _write_repeated(of,c,count,bs)
+    finally:
+        of.close()
 
 
 def delete_file(fn):
@@ -447,60 +984,95 @@ def createfile_zero(fn,count,bs):
     createfile(fn,'\0',count,bs)
 
 
-import platform
+def md5sum(fn):
+    """ Return the md5 checksum of the local file (computed in-process and cached while the file is unchanged,
+    see smashbox.utilities.checksum) or "NO_CHECKSUM_ERROR" if the file cannot be read.
+    """
+    from smashbox.utilities import checksum
+    try:
+        return checksum.file_digest(fn, 'md5')
+    except (IOError, OSError), x:
+        logger.warning('md5sum %s: %s', fn, x)
+        return "NO_CHECKSUM_ERROR"
+
+def checksums(fn, algorithms=('md5',)):
+    """ Return {algorithm: hexdigest} of the local file computed in one read (the names of the algorithms are those
+    of smashbox.utilities.checksum, e.g. md5, sha1, adler32, crc32) or {algorithm: "NO_CHECKSUM_ERROR"} if the file
+    cannot be read.
+    """
+    from smashbox.utilities import checksum
+    try:
+        return checksum.file_digests(fn, algorithms)
+    except (IOError, OSError), x:
+        logger.warning('checksums %s: %s', fn, x)
+        return dict([(a, "NO_CHECKSUM_ERROR") for a in algorithms])
+
+def tree_md5sum(fn):
+    """ Return the tree digest of the local file (the md5 of the md5 checksums of its segments, hashed in parallel, see
+    smashbox.utilities.checksum.tree_digest) or "NO_CHECKSUM_ERROR" if the file cannot be read. Use it to compare
+    the copies of (huge) files; it is not the md5 checksum of the file.
+    """
+    from smashbox.utilities import checksum
+    try:
+        return checksum.tree_digest(fn, 'md5')
+    except (IOError, OSError), x:
+        logger.warning('tree_md5sum %s: %s', fn, x)
+        return "NO_CHECKSUM_ERROR"
 
-if platform.system() == 'Darwin':
 
-    def md5sum(fn):
-        process = subprocess.Popen('md5 %s'%fn,shell=True,stdout=subprocess.PIPE)
-        out = process.communicate()[0]
-        try:
-            return out.split()[-1]
-        except IndexError:
-            return "NO_CHECKSUM_ERROR"
+def hexdump(fn):
+    runcmd('hexdump %s'%fn)
 
-else:  # linux
 
-    def md5sum(fn):
-        process=subprocess.Popen('md5sum %s'%fn,shell=True,stdout=subprocess.PIPE)
-        out = process.communicate()[0]
-        try:
-            return out.split()[0]
-        except IndexError:
-            return "NO_CHECKSUM_ERROR"
+def get_checksums_on_server(paths, algorithms=('md5',), workers=None):
+    """ Compute the checksums of the files on the server in one round trip (server-tools/checksum_agent.py run
+    with config.oc_server_python in the server shell channel, see server_shell).
 
+    The paths are relative to oc_server_datadirectory and may contain shell wildcards.
+    Return the list of dicts {'path', 'size', <algorithm>: hexdigest} (or {'path', 'error'} for unreadable files).
+    """
+    import json
 
-def hexdump(fn):
-    runcmd('hexdump %s'%fn)
+    if workers is None:
+        workers = int(config.get('oc_server_checksum_workers', 8))
 
+    from smashbox.utilities import server_shell
 
-def list_versions_on_server(fn):
-    cmd = "%(oc_server_shell_cmd)s md5sum %(oc_server_datadirectory)s/%(oc_account_name)s/files_versions/%(filename)s.v*" % config._dict(filename=os.path.join(config.oc_server_folder, os.path.basename(fn)))  # PENDING: bash -x 
-    runcmd(cmd)
+    agent = os.path.join(config.oc_server_tools_path, 'checksum_agent.py')
+    cmd = "%s %s --base %s --workers %d %s" % (config.get('oc_server_python', 'python'), agent, config.oc_server_datadirectory,
+                                               workers, " ".join(['--algorithm %s' % a for a in algorithms]))
 
+    logger.info('running %s (%d paths)', repr(cmd), len(paths))
+    rc, output = server_shell.run(cmd, input=json.dumps(list(paths)))
 
-def hexdump_versions_on_server(fn):
-    cmd = "%(oc_server_shell_cmd)s hexdump %(oc_server_datadirectory)s/%(oc_account_name)s/files_versions/%(filename)s.v*" % config._dict(filename=os.path.join(config.oc_server_folder, os.path.basename(fn)))  # PENDING: bash -x 
-    runcmd(cmd)
+    if rc != 0:
+        raise RuntimeError('checksum agent failed (exit code %d): %s' % (rc, output.strip()))
 
+    reply = json.loads(output.strip().splitlines()[-1])  # the reply is the last line (stderr is merged)
+    logger.info('checksums of %d files computed on the server in %.2fs', len(reply['files']), reply['elapsed'])
+    return reply['files']
 
-def get_md5_versions_on_server(fn):
-    cmd = "%(oc_server_shell_cmd)s md5sum %(oc_server_datadirectory)s/%(oc_account_name)s/files_versions/%(filename)s.v*" % config._dict(filename=os.path.join(config.oc_server_folder, os.path.basename(fn)))
 
-    logger.info('running %s',repr(cmd))
-    process=subprocess.Popen(cmd,stdout=subprocess.PIPE,shell=True)
+def _versions_path(fn):
+    return os.path.join(config.oc_account_name, 'files_versions', config.oc_server_folder, os.path.basename(fn)) + '.v*'
 
-    stdout=process.communicate()[0]
 
-    result=[]
-    for line in stdout.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        md,fn = line.split()
-        result.append((md,os.path.basename(fn)))
-        #log(result[-1])
+def list_versions_on_server(fn):
+    for f in get_checksums_on_server([_versions_path(fn)]):
+        logger.info('%s  %s', f.get('md5', f.get('error')), f['path'])
+
+
+def hexdump_versions_on_server(fn):
+    from smashbox.utilities import server_shell
+    rc, output = server_shell.run("hexdump %s/%s" % (config.oc_server_datadirectory, _versions_path(fn)))
+    logger.info('hexdump versions of %s:\n%s', fn, output)
+
 
+def get_md5_versions_on_server(fn):
+    result=[]
+    for f in get_checksums_on_server([_versions_path(fn)]):
+        if 'md5' in f:
+            result.append((f['md5'],os.path.basename(f['path'])))
     return result
 
 
@@ -536,11 +1108,65 @@ def fatal_check(expr,message=""):
         raise AssertionError(message)
 
 
+# ###### RESULTS ############
+
+def results_file(rundir=None):
+    """ The file collecting the results recorded in the run directory (one JSON record per line).
+    """
+    if rundir is None:
+        rundir = config.rundir
+    return os.path.join(rundir,'_results.jsonl')
+
+
+def record_result(name,value):
+    """ Record a named measurement (any JSON-serializable value) in the results of the current run.
+
+    Records are appended to results_file() by all workers, tagged with the name of the worker and its current step.
+    """
+    import json
+    from smashbox.utilities import reflection
+
+    try:
+        worker,step = reflection.getProcessName(),reflection.getCurrentStep()
+    except (NameError,AttributeError): # not running inside the smashbox engine
+        worker,step = None,None
+
+    record = json.dumps({'name':name,'worker':worker,'step':step,'time':time.time(),'value':value})+'\n'
+
+    if not os.path.isdir(config.rundir):
+        mkdir(config.rundir)
+
+    # a single write on a file opened in the append mode does not interleave with the other workers
+    fd = os.open(results_file(),os.O_WRONLY|os.O_APPEND|os.O_CREAT,0644)
+    try:
+        os.write(fd,record)
+    finally:
+        os.close(fd)
+
+
+def load_results(name=None,rundir=None):
+    """ Return the list of records (dicts) recorded in the run directory, optionally only the ones with the given name.
+    """
+    import json
+
+    fn = results_file(rundir)
+    if not os.path.exists(fn):
+        return []
+
+    records = []
+    with open(fn) as f:
+        for line in f:
+            r = json.loads(line)
+            if name is None or r['name'] == name:
+                records.append(r)
+    return records
+
+
 # ###### Server Log File Scraping ############
 
 def reset_server_log_file():
-    """ Deletes the existing server log file so that there is a clean
-        log file for the test run
+    """ Record the current size of the server log file so that only the
+        part of the log written during the test run is checked
     """
 
     try:
@@ -549,14 +1175,59 @@ def reset_server_log_file():
     except AttributeError: # allow this option not to be defined at all
         return
 
-    logger.info('Removing existing server log file')
-    cmd = '%s rm -rf %s/owncloud.log' % (config.oc_server_shell_cmd, config.oc_server_datadirectory)
-    runcmd(cmd)
+    from smashbox.utilities import server_log
+
+    config._oc_server_log_offset = server_log.server_log_size()
+    logger.info('Server log file offset: %d', config._oc_server_log_offset)
 
 
+_server_log_tailer = None
+
+def start_server_log_tailer():
+    """ Follow the server log in the background while the workers run (if config.oc_server_log_tail is set) and
+    count the problems found in the log per supervisor step. Called by the execution engine once the workers start.
+    """
+    global _server_log_tailer
+
+    if not config.get('oc_server_log_tail', False):
+        return
+
+    from smashbox.utilities import server_log
+    from smashbox.utilities import reflection
+
+    offset = config.get('_oc_server_log_offset', None)
+    if offset is None:
+        offset = server_log.server_log_size()
+
+    _server_log_tailer = server_log.LogTailer(reflection.getSupervisorStep, offset)
+    _server_log_tailer.start()
+
+
+def stop_server_log_tailer():
+    """ Stop following the server log, report the problems found per step and record them in the run results.
+    """
+    global _server_log_tailer
+
+    if _server_log_tailer is None:
+        return
+
+    results = _server_log_tailer.stop()
+    _server_log_tailer = None
+
+    for step in sorted(results['per_step'].keys()):
+        counts = results['per_step'][step]
+        if counts['warnings'] or counts['errors'] or counts['fatals'] or counts['patterns']:
+            logger.warning('server log step %s: %d warnings, %d errors, %d fatals, patterns: %s', step,
+                           counts['warnings'], counts['errors'], counts['fatals'], counts['patterns'])
+
+    record_result('server_log_steps', results)
+    return results
+
 
 def scrape_log_file(d):
-    """ Copies over the server log file and searches it for specific strings
+    """ Copies over the part of the server log file written since reset_server_log_file() and searches it
+    for known problems (config.oc_server_log_patterns) in a single pass; with config.oc_server_log_requests
+    the per-endpoint request statistics are computed in the same pass
 
     :param d: The directory where the server log file is to be copied to
 
@@ -568,37 +1239,27 @@ def scrape_log_file(d):
     except AttributeError: # allow this option not to be defined at all
         return
 
-    if config.oc_server == '127.0.0.1' or config.oc_server == 'localhost':
-        cmd = 'cp %s/owncloud.log %s/.' % (config.oc_server_datadirectory, d)
-    else:
-        try:
-            log_user = config.oc_server_log_user
-        except AttributeError:  # allow this option not to be defined at all
-            log_user = 'root'
-        cmd = 'scp -P %d %s@%s:%s/owncloud.log %s/.' % (config.scp_port, log_user, config.oc_server, config.oc_server_datadirectory, d)
-    rtn_code,stdout,stderr = runcmd(cmd)
-    error_check(rtn_code > 0, 'Could not copy the log file from the server, command returned %s' % rtn_code)
+    from smashbox.utilities import server_log
 
-    # search logfile for string (1 == not found; 0 == found):
-    cmd = "grep -i \"integrity constraint violation\" %s/owncloud.log" % d
-    rtn_code,stdout,stderr = runcmd(cmd, ignore_exitcode=True, log_warning=False)
-    error_check(rtn_code > 0, "\"Integrity Constraint Violation\" message found in server log file")
+    analyzer = None
+    if config.get('oc_server_log_requests', False):
+        analyzer = server_log.RequestAnalyzer()
 
-    cmd = "grep -i \"Exception\" %s/owncloud.log" % d
-    rtn_code,stdout,stderr = runcmd(cmd, ignore_exitcode=True, log_warning=False)
-    error_check(rtn_code > 0, "\"Exception\" message found in server log file")
+    results = server_log.scan_server_log(copy_to=os.path.join(d,'owncloud.log'), analyzer=analyzer)
 
-    cmd = "grep -i \"could not obtain lock\" %s/owncloud.log" % d
-    rtn_code,stdout,stderr = runcmd(cmd, ignore_exitcode=True, log_warning=False)
-    error_check(rtn_code > 0, "\"Could Not Obtain Lock\" message found in server log file")
+    for pattern in sorted(results.keys()):
+        r = results[pattern]
+        if r['count']:
+            error_check(False, "\"%s\" message found in server log file %d times, first at line %d: %s" % (pattern, r['count'], r['first']['line'], r['first']['text']))
 
-    cmd = "grep -i \"db error\" %s/owncloud.log" % d
-    rtn_code,stdout,stderr = runcmd(cmd, ignore_exitcode=True, log_warning=False)
-    error_check(rtn_code > 0, "\"DB Error\" message found in server log file")
+    record_result('server_log', results)
 
-    cmd = "grep -i \"stat failed\" %s/owncloud.log" % d
-    rtn_code,stdout,stderr = runcmd(cmd, ignore_exitcode=True, log_warning=False)
-    error_check(rtn_code > 0, "\"Stat Failed\" message found in server log file")
+    if analyzer:
+        requests = analyzer.finish()
+        logger.info('server requests:\n%s', '\n'.join(server_log.format_request_stats(requests)))
+        record_result('server_requests', requests)
+
+    return results
 
 
 # ###### API Calls ############
@@ -610,15 +1271,79 @@ def get_oc_api():
     """
     import owncloud
 
+    oc_api = owncloud.Client(_oc_api_url(), verify_certs=False)
+    return oc_api
+
+
+def _oc_api_url():
     protocol = 'http'
     if config.oc_ssl_enabled:
         protocol += 's'
 
-    url = protocol + '://' + config.oc_server + '/' + config.oc_root
-    oc_api = owncloud.Client(url, verify_certs=False)
+    return protocol + '://' + config.oc_server + '/' + config.oc_root
+
+
+# logged-in API clients of this process (and thread): {(username,url): (oc_api,login_time)}
+_oc_api_sessions = threading.local()
+
+def _oc_api_session_cache():
+    if getattr(_oc_api_sessions,'pid',None) != os.getpid(): # do not share the connections with the forking parent
+        _oc_api_sessions.pid = os.getpid()
+        _oc_api_sessions.cache = {}
+    return _oc_api_sessions.cache
+
+
+def get_oc_api_session(username=None, password=None):
+    """ Returns a Client instance logged in as username (the admin user by default).
+
+    The logged-in clients are cached per process and reused (together with their keep-alive connections)
+    for config.oc_api_session_ttl seconds (default 300, 0 disables the cache), so that each API call does not cost
+    an extra login round trip and a new connection.
+
+    :param username: name of the user, if None then config.oc_admin_user
+    :param password: password of the user, if None then config.oc_admin_password
+    :returns: Client instance
+    """
+    if username is None:
+        username = config.oc_admin_user
+        password = config.oc_admin_password
+
+    key = (username, _oc_api_url())
+    ttl = float(config.get('oc_api_session_ttl', 300))
+
+    cache = _oc_api_session_cache()
+
+    try:
+        cached_api, login_time = cache[key]
+        if time.time() - login_time < ttl:
+            return cached_api
+        del cache[key]
+        _oc_api_logout(cached_api)
+    except KeyError:
+        pass
+
+    oc_api = get_oc_api()
+    oc_api.login(username, password)
+    cache[key] = (oc_api, time.time())
     return oc_api
 
 
+def invalidate_oc_api_session(username=None):
+    """ Drop the cached session(s) of username (or all sessions if username is None), e.g. after the user was deleted.
+    """
+    cache = _oc_api_session_cache()
+    for key in cache.keys():
+        if username is None or key[0] == username:
+            _oc_api_logout(cache.pop(key)[0])
+
+
+def _oc_api_logout(oc_api):
+    try:
+        oc_api.logout()
+    except Exception,x:
+        logger.debug('logout failed: %s', x)
+
+
 def share_file_with_user(filename, sharer, sharee, **kwargs):
     """ Shares a file with a user
 
@@ -633,8 +1358,7 @@ def share_file_with_user(filename, sharer, sharee, **kwargs):
 
     logger.info('%s is sharing file %s with user %s', sharer, filename, sharee)
 
-    oc_api = get_oc_api()
-    oc_api.login(sharer, config.oc_account_password)
+    oc_api = get_oc_api_session(sharer, config.oc_account_password)
 
     try:
         share_info = oc_api.share_file_with_user(filename, sharee, **kwargs)
@@ -657,8 +1381,7 @@ def delete_share(sharer, share_id):
     """
     logger.info('Deleting share %i from user %s', share_id, sharer)
 
-    oc_api = get_oc_api()
-    oc_api.login(sharer, config.oc_account_password)
+    oc_api = get_oc_api_session(sharer, config.oc_account_password)
     oc_api.delete_share(share_id)
 
 
@@ -674,8 +1397,7 @@ def share_file_with_group(filename, sharer, group, **kwargs):
     """
     logger.info('%s is sharing file %s with group %s', sharer, filename, group)
 
-    oc_api = get_oc_api()
-    oc_api.login(sharer, config.oc_account_password)
+    oc_api = get_oc_api_session(sharer, config.oc_account_password)
     groupshare_info = oc_api.share_file_with_group(filename, group, **kwargs)
 
     logger.info('share id for file group share is %i', groupshare_info.share_id)
@@ -690,8 +1412,7 @@ def add_user_to_group(username, group_name):
     """
     logger.info('Adding user %s to group %s', username, group_name)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     oc_api.add_user_to_group(username, group_name)
 
 
@@ -703,8 +1424,7 @@ def remove_user_from_group(username, group_name):
     """
     logger.info('Removing user %s from group %s', username, group_name)
 
-    oc_api = get_oc_api()
-    oc_api.login(config.oc_admin_user, config.oc_admin_password)
+    oc_api = get_oc_api_session()
     oc_api.remove_user_from_group(username, group_name)
 
 
@@ -0,0 +1,233 @@
+
+from smashbox.utilities import *
+
+# a pool of pre-provisioned test accounts
+#
+# creating a user and its first login (key generation) are among the slowest server operations, so instead of
+# re-creating the test accounts in every run (oc_account_reset_procedure='delete') the accounts may be provisioned
+# once (see bin/smash_account_pool) and leased by the test runs (oc_account_reset_procedure='pool')
+#
+# a pool entry is a group of accounts: the main account NAME and the numbered test users NAME1..NAMEn
+# (as used by the tests with oc_number_test_users); a lease is cleaned by deleting the content of the
+# accounts via webdav (instead of re-creating them) and the lease is released when the test ends
+#
+# the pool is kept in a local directory (config.oc_account_pool_dir, by default <smashdir>/_account_pool/<oc_server>):
+#
+#  NAME.account   : json description of the entry (name, number of users, password)
+#  NAME.lease     : exists while the entry is leased, json description of the lease holder
+#  .lock          : the leases are taken, broken and released while holding an exclusive flock on this file
+#
+# a wiped account keeps the server state which is not visible in its files: shares, versions and trashbin
+
+import contextlib
+import fcntl
+import json
+import socket
+
+
+def pool_dir():
+    d = config.get('oc_account_pool_dir', None)
+    if not d:
+        d = os.path.join(config.smashdir, '_account_pool', config.oc_server)
+    return d
+
+
+def _entry_file(name):
+    return os.path.join(pool_dir(), name + '.account')
+
+
+def _lease_file(name):
+    return os.path.join(pool_dir(), name + '.lease')
+
+
+def _usernames(entry):
+    return [entry['name']] + ['%s%i' % (entry['name'], i) for i in range(1, entry['nusers'] + 1)]
+
+
+def list_entries():
+    """ Return the list of pool entries (dicts) with the lease information (None if not leased).
+    """
+    import glob
+
+    entries = []
+    for fn in sorted(glob.glob(os.path.join(pool_dir(), '*.account'))):
+        entry = json.load(open(fn))
+        try:
+            entry['lease'] = json.load(open(_lease_file(entry['name'])))
+        except (IOError, ValueError):
+            entry['lease'] = None
+        entries.append(entry)
+    return entries
+
+
+def provision_pool(naccounts, nusers=None, prefix='smashpool', password=None):
+    """ Provision naccounts new pool entries, each with the main account and nusers numbered test users
+    (default config.oc_number_test_users). Return the list of the new entries.
+    """
+    from smashbox.utilities import provisioning
+
+    if nusers is None:
+        nusers = config.oc_number_test_users
+    if password is None:
+        password = config.oc_account_password
+
+    mkdir(pool_dir())
+
+    existing = set([e['name'] for e in list_entries()])
+
+    entries = []
+    i = 0
+    while len(entries) < naccounts:
+        i += 1
+        name = '%s%03d-' % (prefix, i)  # the dash separates the numbered users: smashpool001-1, smashpool001-2, ...
+        if name not in existing:
+            entries.append({'name': name, 'nusers': nusers, 'password': password, 'created': time.time()})
+
+    usernames = []
+    for entry in entries:
+        usernames += _usernames(entry)
+
+    provisioning.provision_users(usernames, password)
+
+    for entry in entries:
+        json.dump(entry, open(_entry_file(entry['name']), 'w'))
+        logger.info('account pool: added %s with %d users', entry['name'], entry['nusers'])
+
+    return entries
+
+
+def remove_pool_entry(name, delete_accounts=True):
+    """ Remove the entry from the pool (and delete its accounts on the server).
+    """
+    entry = json.load(open(_entry_file(name)))
+    if delete_accounts:
+        for username in _usernames(entry):
+            delete_owncloud_account(username)
+    remove_file(_entry_file(name))
+    if os.path.exists(_lease_file(name)):
+        remove_file(_lease_file(name))
+
+
+def _lease_is_stale(lease):
+    """ The lease is stale if its holder process is gone (on this host) or the lease timed out.
+    """
+    if time.time() - lease['time'] > float(config.get('oc_account_pool_lease_timeout', 24*3600)):
+        return True
+
+    if lease['host'] == socket.gethostname():
+        try:
+            os.kill(lease['pid'], 0)
+        except OSError:
+            return True
+
+    return False
+
+
+@contextlib.contextmanager
+def _pool_lock():
+    """ Hold the exclusive lock of the pool directory.
+    """
+    f = open(os.path.join(pool_dir(), '.lock'), 'a')
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield
+    finally:
+        f.close()  # releases the lock
+
+
+def _read_lease(name):
+    """ Return the lease of the entry or None if it is not leased. Raise ValueError if the lease is unreadable.
+    """
+    try:
+        return json.load(open(_lease_file(name)))
+    except IOError:
+        return None
+
+
+def _is_ours(lease):
+    return lease['host'] == socket.gethostname() and lease['pid'] == os.getpid()
+
+
+def _try_lease(name):
+    lease = {'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time(), 'rundir': config.get('rundir', None)}
+
+    with _pool_lock():
+        try:
+            old_lease = _read_lease(name)
+        except ValueError:
+            return False  # not written by this module: leave it alone
+        if old_lease is not None:
+            if not _lease_is_stale(old_lease):
+                return False
+            logger.warning('account pool: breaking stale lease of %s: %s', name, old_lease)
+
+        # the new lease replaces the stale one in one step (rename) so the lease file is never missing or partial
+        tmp_fn = '%s.%d~' % (_lease_file(name), os.getpid())
+        f = open(tmp_fn, 'w')
+        try:
+            json.dump(lease, f)
+        finally:
+            f.close()
+        os.rename(tmp_fn, _lease_file(name))
+    return True
+
+
+def lease_account(nusers=0):
+    """ Lease a pool entry with at least nusers numbered test users, wipe the content of its accounts and return the entry.
+    """
+    nusers = nusers or 0
+
+    for entry in list_entries():
+        if entry['nusers'] < nusers or entry['lease'] is not None and not _lease_is_stale(entry['lease']):
+            continue
+        if _try_lease(entry['name']):
+            logger.info('account pool: leased %s', entry['name'])
+            return entry
+
+    raise RuntimeError('account pool %s: no free entry with at least %d users (provision more with bin/smash_account_pool)' % (pool_dir(), nusers))
+
+
+def release_account(name, force=False):
+    """ Return the entry leased by this process to the pool (any lease of the entry if force is True).
+    Return True if the lease was released.
+    """
+    with _pool_lock():
+        try:
+            lease = _read_lease(name)
+        except ValueError:
+            lease = {'host': None, 'pid': None}
+        if lease is None:
+            logger.warning('account pool: %s is not leased', name)
+            return False
+        if not force and not _is_ours(lease):
+            logger.warning('account pool: not releasing %s leased by another process: %s', name, lease)
+            return False
+        remove_file(_lease_file(name))
+    logger.info('account pool: released %s', name)
+    return True
+
+
+def wipe_account(user_num=None):
+    """ Delete all files and folders of the current account (or the numbered test user) via webdav.
+
+    Only the files are deleted: the shares, the versions and the trashbin of the account are kept (and seen by the
+    next run which leases the account).
+    """
+    children = webdav_ls('/', user_num=user_num)
+    if not children:
+        return
+    for name in children.keys():
+        webdav_delete(name, user_num=user_num)
+    logger.info('account pool: wiped %d entries of the account (user_num=%s)', len(children), user_num)
+
+
+def use_leased_account(entry):
+    """ Make the leased entry the test account of the current run (config.oc_account_name) and wipe its content.
+    """
+    config.oc_account_name = entry['name']
+    config.oc_account_password = entry['password']
+    config._oc_account_pool_lease = entry['name']
+
+    wipe_account()
+    for i in range(1, entry['nusers'] + 1):
+        wipe_account(user_num=i)
@@ -0,0 +1,217 @@
+
+from smashbox.utilities import *
+
+# per-block digests of the hashfiles to localize the corruption
+#
+# when a hashfile is created with config.hashfile_block_digests the md5 digests of its consecutive blocks are stored
+# in a sidecar file outside of the synced directories (<rundir>/_hashfile_digests/<md5>.json), for several block sizes:
+# the owncloud chunk size (so that the corrupted ranges may be related to the chunked uploads) and the sizes in
+# config.hashfile_block_sizes
+#
+# if the md5 of a file does not match then the file is read once and its block digests are compared with the sidecar;
+# the corrupted ranges are classified as:
+#
+#  wrong      : the content of the range is not found anywhere in the original file
+#  shifted    : the content of the range comes from another offset of the original file
+#  duplicated : as shifted but the original content is also present at the other offset
+#  extra      : the range is beyond the end of the original file
+#  missing    : the content of the original range is not found anywhere in the file
+#
+# the random content (config.hashfile_content = "random") repeats the same block throughout the file so the shifted
+# and duplicated ranges may only be told apart for the seeded content
+
+import hashlib
+import json
+
+DIGEST_SIZE = 8  # bytes of the md5 of a block kept in the sidecar
+
+
+def block_sizes():
+    """ The block sizes of the digests, largest first.
+    """
+    sizes = set([OWNCLOUD_CHUNK_SIZE()] + list(config.get('hashfile_block_sizes', [10*1024*1024, 16*1024])))
+    return sorted(sizes, reverse=True)
+
+
+class BlockHasher:
+    """ Compute the digests of the consecutive blocks of the data passed to update() for several block sizes.
+    """
+
+    def __init__(self, sizes=None):
+        if sizes is None:
+            sizes = block_sizes()
+        self.sizes = list(sizes)
+        self.nbytes = 0
+        self._hashes = [hashlib.md5() for s in self.sizes]
+        self._fill = [0]*len(self.sizes)
+        self._digests = [[] for s in self.sizes]
+
+    def update(self, data):
+        view = memoryview(data)
+        n = len(view)
+        for k, size in enumerate(self.sizes):
+            h, fill, digests = self._hashes[k], self._fill[k], self._digests[k]
+            pos = 0
+            while pos < n:
+                m = min(size - fill, n - pos)
+                h.update(view[pos:pos+m])
+                fill += m
+                pos += m
+                if fill == size:
+                    digests.append(h.hexdigest()[:DIGEST_SIZE*2])
+                    h = hashlib.md5()
+                    fill = 0
+            self._hashes[k], self._fill[k] = h, fill
+        self.nbytes += n
+
+    def digests(self):
+        """ Return {block size: list of the hex digests of the blocks} (the last block may be partial).
+        """
+        result = {}
+        for k, size in enumerate(self.sizes):
+            d = list(self._digests[k])
+            if self._fill[k]:
+                d.append(self._hashes[k].hexdigest()[:DIGEST_SIZE*2])
+            result[size] = d
+        return result
+
+
+def sidecar_path(md5):
+    return os.path.join(config.rundir, '_hashfile_digests', md5+'.json')
+
+
+def save(md5, hasher):
+    """ Store the block digests of the file with the md5 checksum (written to a temporary file and renamed, so a sidecar
+    is never seen partially written).
+    """
+    fn = sidecar_path(md5)
+    if not os.path.isdir(os.path.dirname(fn)):
+        mkdir(os.path.dirname(fn))
+    data = {'md5': md5, 'size': hasher.nbytes, 'blocks': {}}
+    for size, digests in hasher.digests().items():
+        data['blocks'][str(size)] = ''.join(digests)
+    tmp_fn = '%s.%d~' % (fn, os.getpid())
+    f = open(tmp_fn, 'w')
+    try:
+        json.dump(data, f)
+    finally:
+        f.close()
+    os.rename(tmp_fn, fn)
+
+
+def load(md5):
+    """ Return (size, {block size: list of hex digests}) of the file with the md5 checksum or None if there is no sidecar.
+    """
+    try:
+        data = json.load(open(sidecar_path(md5)))
+    except (IOError, OSError):
+        return None
+    except ValueError:  # truncated (e.g. written by an older version which did not use a temporary file)
+        logger.warning('ignoring unreadable block digests %s', sidecar_path(md5))
+        return None
+
+    n = DIGEST_SIZE*2
+    blocks = {}
+    for size, digests in data['blocks'].items():
+        blocks[int(size)] = [digests[i:i+n] for i in range(0, len(digests), n)]
+    return data['size'], blocks
+
+
+def file_digests(fn, sizes):
+    """ Return (size, {block size: list of hex digests}) of the file (read once).
+    """
+    from smashbox.utilities import checksum
+
+    hasher = BlockHasher(sizes)
+    f = open(fn, 'rb')
+    try:
+        read_size = checksum.read_size()
+        while True:
+            data = f.read(read_size)
+            if not data:
+                break
+            hasher.update(data)
+    finally:
+        f.close()
+    return hasher.nbytes, hasher.digests()
+
+
+def compare(expected, observed, block_size, expected_size, observed_size):
+    """ Compare the expected and observed block digests and return the list of the corrupted ranges:
+    (kind, start, end, source) where start and end are byte offsets (of the original file for the missing ranges,
+    of the observed file otherwise) and source is the offset of the original content of the shifted and duplicated
+    ranges (None otherwise).
+    """
+    positions = {}
+    for j, d in enumerate(expected):
+        positions.setdefault(d, []).append(j)
+
+    blocks = []  # (kind, index, source index)
+
+    for i, d in enumerate(observed):
+        if i < len(expected) and d == expected[i]:
+            continue
+        if d in positions:
+            j = min(positions[d], key=lambda j: abs(j-i))
+            if j < len(observed) and observed[j] == expected[j]:
+                blocks.append(('duplicated', i, j))
+            else:
+                blocks.append(('shifted', i, j))
+        elif i >= len(expected):
+            blocks.append(('extra', i, None))
+        else:
+            blocks.append(('wrong', i, None))
+
+    present = set(observed)
+    for j, d in enumerate(expected):
+        if d not in present:
+            blocks.append(('missing', j, None))
+
+    # coalesce the consecutive blocks of the same kind (and of the same shift)
+    ranges = []
+    last = None
+    for kind, i, j in blocks:
+        if last is not None and last[0] == kind and last[2] == i and (j is None or last[3] + (last[2] - last[1]) == j):
+            last[2] = i+1
+            continue
+        last = [kind, i, i+1, j]
+        ranges.append(last)
+
+    result = []
+    for kind, first, end, source in ranges:
+        size = expected_size if kind == 'missing' else observed_size
+        if source is not None:
+            source *= block_size
+        result.append((kind, first*block_size, min(end*block_size, size), source))
+    return result
+
+
+def localize(fn, md5, sidecar=None):
+    """ Compare the file with the sidecar of the md5 checksum (its expected content) and return
+    {block size: list of corrupted ranges} (see compare()) or None if there is no sidecar.
+    The sidecar may be passed if it is already loaded (see load()).
+    """
+    if sidecar is None:
+        sidecar = load(md5)
+    if sidecar is None:
+        return None
+
+    expected_size, expected = sidecar
+    observed_size, observed = file_digests(fn, expected.keys())
+
+    result = {}
+    for size in expected:
+        result[size] = compare(expected[size], observed[size], size, expected_size, observed_size)
+    return result
+
+
+def format_ranges(ranges):
+    """ A short description of the corrupted ranges of one block size.
+    """
+    parts = []
+    for kind, start, end, source in ranges:
+        if source is None:
+            parts.append('%s %d-%d' % (kind, start, end))
+        else:
+            parts.append('%s %d-%d (from %d)' % (kind, start, end, source))
+    return ', '.join(parts) or 'no corrupted blocks'
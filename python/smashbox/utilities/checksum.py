@@ -0,0 +1,346 @@
+
+from smashbox.utilities import *
+
+# in-process checksums of local files with a cache keyed by the file metadata
+#
+# the tests verify the same (possibly multi-GB) files several times across the steps; the digest of a file is
+# cached with the key (device, inode, size, mtime in ns, ctime) so verifying an unchanged file again costs only
+# a stat; any modification of the file (content, truncation, replacement by rename) changes the key
+#
+# the behaviour is controlled by these config options:
+#
+#  checksum_read_size  : size of the reads (bytes, rounded to a multiple of 64KB), default 8MB
+#  checksum_cache_size : maximum number of cached digests, 0 disables the cache (default 10000)
+#  checksum_segment_size : size of the segments of tree_digest() (bytes, rounded to a multiple of 64KB), default 64MB;
+#                          the files larger than a segment are read ahead in a separate thread by file_digest()
+#  checksum_workers : number of threads hashing the segments of a file in tree_digest() (default 4)
+#
+# a single md5 of a huge file is bounded by one core; tree_digest() hashes the segments of the file in parallel and
+# returns the digest of the concatenated segment digests: it is not the md5 of the file (which the names of the
+# hashfiles carry) but it verifies that two copies of a file are the same
+#
+# the algorithms are looked up by name in a registry (see register()): the hashlib algorithms (md5, sha1, sha256...)
+# and the zlib checksums (adler32, crc32); several algorithms are computed in one read by file_digests()
+
+import hashlib
+import threading
+import collections
+import struct
+import zlib
+import Queue
+
+ALIGNMENT = 64*1024
+
+_cache = collections.OrderedDict()  # LRU: key -> hexdigest
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+
+class _ZlibChecksum:
+    """ A zlib checksum (adler32, crc32) with the interface of the hashlib objects.
+    """
+
+    def __init__(self, func, value):
+        self._func = func
+        self._value = value
+
+    def update(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()  # zlib does not take memoryviews in python 2
+        self._value = self._func(data, self._value)
+
+    def digest(self):
+        return struct.pack('>I', self._value & 0xffffffff)
+
+    def hexdigest(self):
+        return '%08x' % (self._value & 0xffffffff)
+
+
+class _MultiHash:
+    """ Update several hash objects with the same data.
+    """
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def update(self, data):
+        for h in self.hashes:
+            h.update(data)
+
+
+# name -> (factory, hexdigest length, OC-Checksum type)
+_algorithms = {}
+
+
+def register(name, factory, hexlen, header=None):
+    """ Register the checksum algorithm name: factory() returns a new object with the update(), digest() and
+    hexdigest() methods, hexlen is the length of its hexdigest and header its type in the OC-Checksum header.
+    """
+    _algorithms[name] = (factory, hexlen, header or name.upper())
+
+
+for _name, _header in [('md5', 'MD5'), ('sha1', 'SHA1'), ('sha256', 'SHA256'), ('sha512', 'SHA512')]:
+    register(_name, getattr(hashlib, _name), getattr(hashlib, _name)().digest_size*2, _header)
+
+register('adler32', lambda: _ZlibChecksum(zlib.adler32, 1), 8, 'Adler32')
+register('crc32', lambda: _ZlibChecksum(zlib.crc32, 0), 8, 'CRC32')
+
+
+def algorithms():
+    """ The names of the registered algorithms.
+    """
+    return sorted(_algorithms)
+
+
+def new(algorithm):
+    """ Return a new hash object of the algorithm (a registered name or any hashlib algorithm).
+    """
+    if algorithm in _algorithms:
+        return _algorithms[algorithm][0]()
+    return hashlib.new(algorithm)
+
+
+def hexdigest_length(algorithm):
+    if algorithm in _algorithms:
+        return _algorithms[algorithm][1]
+    return hashlib.new(algorithm).digest_size*2
+
+
+def header_type(algorithm):
+    """ The type of the algorithm in the OC-Checksum header (e.g. Adler32).
+    """
+    return _algorithms[algorithm][2]
+
+
+def from_header_type(cstype):
+    """ The name of the algorithm of the OC-Checksum type (case insensitive) or None if it is not registered.
+    """
+    for name, (factory, hexlen, header) in _algorithms.items():
+        if header.lower() == cstype.lower():
+            return name
+    return None
+
+
+def read_size():
+    n = int(config.get('checksum_read_size', 8*1024*1024))
+    return max(ALIGNMENT, n - n % ALIGNMENT)
+
+
+def segment_size():
+    n = int(config.get('checksum_segment_size', 64*1024*1024))
+    return max(ALIGNMENT, n - n % ALIGNMENT)
+
+
+def _stat_key(st, algorithm):
+    mtime_ns = getattr(st, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime*1e9)
+    return (algorithm, st.st_dev, st.st_ino, st.st_size, mtime_ns, st.st_ctime)
+
+
+def _cache_get(key):
+    with _cache_lock:
+        digest = _cache.pop(key, None)
+        if digest is None:
+            _stats['misses'] += 1
+            return None
+        _cache[key] = digest  # most recently used
+        _stats['hits'] += 1
+        return digest
+
+
+def _cache_put(key, digest):
+    size = int(config.get('checksum_cache_size', 10000))
+    if size <= 0:
+        return
+    with _cache_lock:
+        _cache[key] = digest
+        while len(_cache) > size:
+            _cache.popitem(last=False)
+
+
+def hash_stream(f, algorithm='md5', size=None, readahead=False):
+    """ Return the hexdigest of the content of the open file f read with large reads into a reusable buffer.
+    With readahead the next buffer is read in a separate thread while the current one is hashed.
+    """
+    h = new(algorithm)
+    if readahead:
+        nbytes = _update_readahead(h, f, size or read_size())
+    else:
+        nbytes = _update(h, f, size or read_size())
+    with _cache_lock:
+        _stats['bytes'] += nbytes
+    return h.hexdigest()
+
+
+def _update(h, f, size, limit=None):
+    """ Update the hash h with the content of f (at most limit bytes) and return the number of bytes read.
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    nbytes = 0
+    while limit is None or nbytes < limit:
+        if limit is None or limit - nbytes >= size:
+            n = f.readinto(buf)
+        else:
+            n = f.readinto(view[:limit-nbytes])
+        if not n:
+            break
+        h.update(view[:n])
+        nbytes += n
+    return nbytes
+
+
+def _update_readahead(h, f, size):
+    """ Same as _update() but the reads and the hashing overlap (both release the GIL).
+    """
+    free = Queue.Queue()
+    full = Queue.Queue()
+    for i in range(3):
+        free.put(bytearray(size))
+
+    def reader():
+        try:
+            while True:
+                buf = free.get()
+                if buf is None:  # the hashing stopped
+                    return
+                n = f.readinto(buf)
+                full.put((buf, n))
+                if not n:
+                    return
+        except (IOError, OSError), x:
+            full.put((None, x))
+
+    t = threading.Thread(target=reader)
+    t.daemon = True
+    t.start()
+
+    nbytes = 0
+    try:
+        while True:
+            buf, n = full.get()
+            if buf is None:
+                raise n
+            if not n:
+                break
+            h.update(memoryview(buf)[:n])
+            nbytes += n
+            free.put(buf)
+    finally:
+        free.put(None)
+        t.join()
+    return nbytes
+
+
+def file_digest(fn, algorithm='md5'):
+    """ Return the hexdigest of the file fn (cached while the file is not modified).
+    Raise IOError/OSError if the file cannot be read.
+    """
+    return file_digests(fn, [algorithm])[algorithm]
+
+
+def file_digests(fn, algorithms=('md5',)):
+    """ Return {algorithm: hexdigest} of the file fn; the digests which are not cached are computed in one read.
+    Raise IOError/OSError if the file cannot be read.
+    """
+    f = open(fn, 'rb', 0)
+    try:
+        st = os.fstat(f.fileno())
+        digests = {}
+        missing = []
+        for a in algorithms:
+            digests[a] = _cache_get(_stat_key(st, a))
+            if digests[a] is None:
+                missing.append(a)
+        if not missing:
+            return digests
+
+        hashes = [new(a) for a in missing]
+        if len(hashes) == 1:
+            h = hashes[0]
+        else:
+            h = _MultiHash(hashes)
+
+        if st.st_size > segment_size():
+            nbytes = _update_readahead(h, f, read_size())
+        else:
+            nbytes = _update(h, f, read_size())
+        with _cache_lock:
+            _stats['bytes'] += nbytes
+
+        # do not cache the digests of a file modified while it was read
+        modified = _stat_key(os.fstat(f.fileno()), None) != _stat_key(st, None)
+        for a, h in zip(missing, hashes):
+            digests[a] = h.hexdigest()
+            if not modified:
+                _cache_put(_stat_key(st, a), digests[a])
+        return digests
+    finally:
+        f.close()
+
+
+def tree_digest(fn, algorithm='md5', size=None, nworkers=None):
+    """ Return the tree digest of the file fn: the hexdigest of the concatenated digests of its segments of the given
+    size (default config.checksum_segment_size), hashed by nworkers threads (default config.checksum_workers).
+    The digest is cached while the file is not modified. Raise IOError/OSError if the file cannot be read.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    if size is None:
+        size = segment_size()
+    if nworkers is None:
+        nworkers = int(config.get('checksum_workers', 4))
+
+    def stat_key():
+        return _stat_key(os.stat(fn), 'tree-%s-%d' % (algorithm, size))
+
+    key = stat_key()
+    digest = _cache_get(key)
+    if digest is not None:
+        return digest
+
+    nsegments = max(1, (key[3] + size - 1) // size)
+
+    def segment(i):
+        h = new(algorithm)
+        f = open(fn, 'rb', 0)
+        try:
+            f.seek(i*size)
+            nbytes = _update(h, f, min(read_size(), size), size)
+        finally:
+            f.close()
+        with _cache_lock:
+            _stats['bytes'] += nbytes
+        return h.digest()
+
+    if nworkers > 1 and nsegments > 1:
+        pool = ThreadPool(min(nworkers, nsegments))
+        try:
+            digests = pool.map(segment, range(nsegments), chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        digests = [segment(i) for i in range(nsegments)]
+
+    h = new(algorithm)
+    h.update(''.join(digests))
+    digest = h.hexdigest()
+
+    # do not cache the digest of a file modified while it was read
+    if stat_key() == key:
+        _cache_put(key, digest)
+    return digest
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def cache_stats():
+    """ Return the number of cache hits and misses, the number of bytes hashed and of the cached digests.
+    """
+    with _cache_lock:
+        return dict(_stats, entries=len(_cache))
@@ -7,9 +7,23 @@ from smashbox.utilities import *
 # the name of a hashfile may be specified using a template string (filemask) where {md5} string represents the content checksum
 # for example: "test_{md5}.dat" 
 
+# the other checksums of the registry of smashbox.utilities.checksum may be used in the filemask in the same way, e.g.
+# {sha1}, {adler32} or {crc32}: "test_{adler32}.dat"; all the checksums in the name of a hashfile are verified (in one
+# read of the file)
+
+# the content is random (os.urandom) or, if the filemask contains the {seed} token or config.hashfile_content is
+# "seeded", generated from a seed (see smashbox.utilities.seeded_content); the {seed} token is replaced by the seed
+# so the expected content of a corrupted file may be regenerated and the offset of the first corrupted byte reported
+# for example: "test_{seed}_{md5}.dat"
+
+# with config.hashfile_block_digests the digests of the blocks of a hashfile are stored outside of the synced
+# directories and the corrupted ranges of a file are reported (see smashbox.utilities.block_digests)
+
 # hashfile size may be specified as
 #  - number of bytes (int)
-#  - a gaussian distribution (mean,sigma)
+#  - a gaussian distribution (mean,sigma) of the log10 of the size
+#  - a lognormal, pareto or empirical distribution (see smashbox.utilities.workload)
+# the sizes are drawn from a seeded random stream of each worker (config.workload_seed reproduces the run)
 
 config.hashfile_size = (3.5,1.37) # standard file distribution: 10^(3.5) Bytes
 config.hashfile_bigsize = (5,1.37) # big file distribution
@@ -32,7 +46,7 @@ def get_files(wdir, filemask=None):
     fl = os.listdir(wdir)
     # if filemask defined then filter names out accordingly
     if filemask:
-        fl = fnmatch.filter(fl, filemask.replace('{md5}', '*'))
+        fl = fnmatch.filter(fl, _glob_pattern(filemask))
     fl = set(fl) - set(config.ignored_files)
     return fl
 
@@ -44,26 +58,45 @@ def count_files(wdir, filemask=None):
     return nf
 
 
+def iter_files(wdir, filemask=None):
+    """ Recursively yield the relative paths of the files below wdir (which match the filemask) as they are found,
+    without listing whole directories in memory (see smashbox.utilities.manifest.iter_tree).
+    """
+    from smashbox.utilities import manifest
+
+    pattern = None
+    if filemask:
+        pattern = _glob_pattern(filemask)
+
+    for relpath, t, st in manifest.iter_tree(wdir, set(config.ignored_files)):
+        if t == 'f' and (pattern is None or fnmatch.fnmatch(os.path.basename(relpath), pattern)):
+            yield relpath
+
+
+def count_files_tree(wdir, filemask=None):
+    """ Count the files below wdir (recursively) which match the filemask.
+    Return (total, per_dir) where per_dir is the dict: relative directory path -> number of files.
+    """
+    total = 0
+    per_dir = {}
+    for relpath in iter_files(wdir, filemask):
+        d = os.path.dirname(relpath)
+        per_dir[d] = per_dir.get(d, 0) + 1
+        total += 1
+    logger.info('%s: %d files found in %d directories', wdir, total, len(per_dir))
+    return total, per_dir
+
+
 def size2nbytes(size):
     """ Return the number of bytes from the size specification (size may be a distribution or nbytes directly).
+    The sizes of a distribution are the next ones of the seeded stream of the worker (see workload).
     """
-    
-    import random, math
-
-    def make_distrib(size):
-        xxx = random.gauss(size[0],size[1])
-        nbytes = int(math.pow(10,xxx))
-        if nbytes<10:nbytes=10
-        if config.hashfile_maxsize and nbytes>config.hashfile_maxsize:
-            nbytes=config.hashfile_maxsize
-        return nbytes
+    from smashbox.utilities import workload
 
     try:
         return int(size)
-    except TypeError:
-        return make_distrib(size)
-    except ValueError:
-        return make_distrib(size)        
+    except (TypeError,ValueError):
+        return workload.next_size(size)
 
 def create_hashfile(wdir,filemask=None,size=None,bs=None,slow_write=None):
     """ Create a random file in wdir.The md5 checksum is placed in the filname name according to filemask: {md5} string in the filemask is replaced by the file checksum.
@@ -81,10 +114,41 @@ def create_hashfile(wdir,filemask=None,size=None,bs=None,slow_write=None):
 
 def create_hashfile2(wdir,filemask=None,size=None,bs=None,slow_write=None):
     """ Same as create_hashfile but return (filename,md5sum).
+
+    The creation of every file is preceded by a delay of config.hashfile_create_delay seconds (default 0.1).
     """
 
-    import hashlib
-    import random
+    delay = float(config.get('hashfile_create_delay',0.1))
+    if delay:
+        time.sleep(delay)
+
+    return _write_hashfile(wdir,filemask,size,bs,slow_write)
+
+def _tmp_name():
+    """ A unique temporary name of a hashfile being written: it ends with ~ (ignored by the sync client) and has no
+    hex characters in its random part, so it cannot be taken for a hashfile (see _name_pattern).
+    """
+    import string
+    import uuid
+
+    return '.hashfile-%s~'%uuid.uuid4().hex.translate(string.maketrans('0123456789abcdef','ghijklmnopqrstuv'))
+
+def _write_hashfile(wdir,filemask=None,size=None,bs=None,slow_write=None,seed=None):
+    """ Create a hashfile and return (filename,md5sum).
+
+    The content is hashed while it is written to a temporary name (ending with ~, ignored by the sync client) which
+    is renamed to the final name at the end. With slow_write the checksum is computed before the file is written
+    under its final name, so the file is visible while it is being written.
+
+    The content is generated from the seed if it is given, if the filemask has the {seed} token or if
+    config.hashfile_content is "seeded" (a new seed is then drawn).
+
+    With config.hashfile_block_digests the block digests of the content are stored too.
+
+    The md5 and the other checksums in the filemask are computed in the same pass.
+    """
+
+    from smashbox.utilities import seeded_content, block_digests, checksum
 
     if size is None:
         size = config.hashfile_size
@@ -99,84 +163,278 @@ def create_hashfile2(wdir,filemask=None,size=None,bs=None,slow_write=None):
 
     assert nblocks*bs+nr==nbytes,'Chunking error!'
 
-    time.sleep(0.1)
+    if filemask is None:
+        filemask = "{md5}"        
+
+    if seed is None and ('{seed}' in filemask or config.get('hashfile_content','random') == 'seeded'):
+        seed = seeded_content.new_seed()
+
+    if seed is None:
+        # Prepare the building blocks
+        block_data = str(os.urandom(bs)) # Repeated nblocks times
+        block_data_r = str(os.urandom(nr))       # Only once
+
+        def chunks(n):
+            """ The content in chunks of n blocks. """
+            nchunk = max(1,min(nblocks,n))
+            chunk = block_data*nchunk
+            for i in range(nblocks//nchunk):
+                yield chunk
+            yield block_data*(nblocks%nchunk)+block_data_r
+    else:
+        def chunks(n):
+            """ The content in chunks of n blocks. """
+            return seeded_content.generate(seed,0,nbytes,n*bs)
+
+    hashes = dict([(a,checksum.new(a)) for a in set(['md5']+_filemask_algorithms(filemask))])
+    if config.get('hashfile_block_digests',False):
+        hashes[None] = block_digests.BlockHasher()
+
+    def hexdigests():
+        return dict([(a,h.hexdigest()) for a,h in hashes.items() if a])
+
+    if slow_write:
+        # Precompute the checksum - we do it separately before writing the file to avoid the file rename
+        for chunk in chunks(1):
+            for h in hashes.values():
+                h.update(chunk)
+
+        fn = os.path.join(wdir,_hashfile_name(filemask,hexdigests(),seed))
+
+        f = file(fn,'w')
+
+        # write data blocks: the delay is paced on the bytes written (the seeded content comes in chunks of whole
+        # pages which are not the size of the blocks)
+        i = 0
+        pending = ''
+        for chunk in chunks(1):
+            pending += chunk
+            while len(pending) >= bs:
+                logger.info('slow_write=%s %d %s',slow_write,i,fn)
+                time.sleep(slow_write)
+                f.write(pending[:bs])
+                f.flush()
+                pending = pending[bs:]
+                i += 1
+        f.write(pending)
+
+        f.close()
+
+    else:
+        import sys
+
+        tmp_fn = os.path.join(wdir,_tmp_name())
+
+        f = file(tmp_fn,'w')
+        try:
+            try:
+                # write (and hash) the content in large chunks (see WRITE_SIZE in smashbox.utilities)
+                for chunk in chunks(max(1,WRITE_SIZE//bs)):
+                    for h in hashes.values():
+                        h.update(chunk)
+                    f.write(chunk)
+            finally:
+                f.close()
+        except:
+            # do not leave a partial file behind (e.g. no space left on device)
+            exc_info = sys.exc_info()
+            try:
+                os.remove(tmp_fn)
+            except OSError:
+                pass
+            raise exc_info[0],exc_info[1],exc_info[2]
+
+        fn = os.path.join(wdir,_hashfile_name(filemask,hexdigests(),seed))
+        os.rename(tmp_fn,fn)
+
+    md5 = hashes['md5'].hexdigest()
+
+    if None in hashes:
+        block_digests.save(md5,hashes[None])
+
+    logger.info("Written hash file %s, nbytes=%d",fn,nbytes)
+    
+    return fn,md5
+
+def create_hashfiles(wdir,n,filemask=None,size=None,bs=None,nworkers=None,rate=None):
+    """ Create n hashfiles in wdir (see create_hashfile) with nworkers threads (default config.hashfile_create_workers)
+    and without the delay of create_hashfile2. If the creation must be paced then rate is the maximum number of
+    files created per second (default config.hashfile_create_rate, None means unlimited).
+
+    The sizes of a distribution are drawn at once.
+
+    Return the list of (filename,md5sum) in the order of creation.
+    """
+    from smashbox.utilities import provisioning, workload
+
+    if nworkers is None:
+        nworkers = int(config.get('hashfile_create_workers',4))
+    if rate is None:
+        rate = config.get('hashfile_create_rate',None)
+
+    limiter = provisioning.RateLimiter(rate)
+
+    if size is None:
+        size = config.hashfile_size
+    try:
+        sizes = [int(size)]*n
+    except (TypeError,ValueError):
+        sizes = workload.sample_sizes(size,n)
 
-    # Prepare the building blocks
-    block_data = str(os.urandom(bs)) # Repeated nblocks times
-    block_data_r = str(os.urandom(nr))       # Only once
+    def create(i):
+        limiter.wait()
+        return _write_hashfile(wdir,filemask,sizes[i],bs)
 
-    #block_data = str(time.time()) + 'a'*bs;
-    #block_data_r = 'a'*nr; 
+    t0 = time.time()
+    files = _map_parallel(create,range(n),nworkers)
+    elapsed = time.time()-t0
 
-    #time.sleep(0.1)
-    #block_data =  str(time.time()) + ":".join(["%09s"%n for n in range(90000)]) #str([str(n)+':' for n in range(10000)])
-    #block_data_r = ""
+    logger.info("Created %d hash files in %s in %.2fs (%.1f files/s)",n,wdir,elapsed,n/elapsed if elapsed else 0.)
+    return files
 
-    # Precompute the checksum - we do it separately before writing the file to avoid the file rename
-    md5 = hashlib.md5()
-    for kb in range(nblocks):
-        md5.update(block_data)
-    md5.update(block_data_r)
+def _filemask_algorithms(filemask):
+    """ The checksum algorithms whose tokens are in the filemask (md5 if the filemask is None).
+    """
+    from smashbox.utilities import checksum
 
     if filemask is None:
-        filemask = "{md5}"        
+        return ['md5']
+    return [a for a in checksum.algorithms() if '{%s}'%a in filemask]
 
+def _hashfile_name(filemask,checksums,seed=None):
+    """ The name of a hashfile: the tokens of the filemask are replaced by the checksums ({algorithm: hexdigest})
+    and the seed.
+    """
+    from smashbox.utilities import seeded_content
+
+    name = filemask
+    for a,digest in checksums.items():
+        name = name.replace('{%s}'%a,digest)
+    if seed is not None:
+        name = name.replace('{seed}',seeded_content.format_seed(seed))
+    return name
+
+def _name_pattern(filemask):
+    """ Return the compiled regexp which extracts the checksums (a group named after each algorithm in the filemask,
+    e.g. 'md5') and the seed (group 'seed', if the filemask has the {seed} token) from the name of a hashfile.
+    """
+    import re
+    from smashbox.utilities import checksum
 
-    fn = os.path.join(wdir,filemask.replace('{md5}',md5.hexdigest()))
+    if filemask is None:
+        #match any names containing a block of 32 characters from hex character set
+        regexp = '\S*(?P<md5>[a-fA-F0-9]{32,32})\S*'
+    else:
+        # re.escape in order to allow *? in the filemask
+        # a block of hex characters of the length of the checksum comes in place of each checksum token, e.g. {md5}
+        # a block of 16 hex characters comes in place of {seed} token
+        regexp = re.escape(filemask).replace('\{seed\}','(?P<seed>[a-f0-9]{16,16})')
+        for a in _filemask_algorithms(filemask):
+            n = checksum.hexdigest_length(a)
+            regexp = regexp.replace('\{%s\}'%a,'(?P<%s>[a-fA-F0-9]{%d,%d})'%(a,n,n),1).replace('\{%s\}'%a,'(?P=%s)'%a)
 
-    f = file(fn,'w')
+    return re.compile(regexp)
 
-    # write data blocks
-    for i in range(nblocks):
-        if slow_write:
-            logger.info('slow_write=%s %d %s',slow_write,i,fn)
-            time.sleep(slow_write)
-        f.write(block_data)
-        if slow_write:
-            f.flush()
+def _glob_pattern(filemask):
+    if filemask is None:
+        return "*"
+    pattern = filemask.replace('{seed}','*')
+    for a in _filemask_algorithms(filemask):
+        pattern = pattern.replace('{%s}'%a,'*')
+    return pattern
+
+def _name_checksums(m):
+    """ The checksums carried by the name of a hashfile (m is the match of its name): {algorithm: hexdigest}.
+    """
+    from smashbox.utilities import checksum
 
-    f.write(block_data_r)
-    f.close()
+    algorithms = checksum.algorithms()
+    return dict([(a,v) for a,v in m.groupdict().items() if a in algorithms and v])
 
-    logger.info("Written hash file %s, nbytes=%d",fn,nbytes)
-    
-    return fn,md5.hexdigest()
+def _verify(item):
+    """ Return (expected,computed) checksums of the hashfile: item is (filename, match of its name).
+    """
+    from smashbox.utilities import checksum
 
-def analyse_hashfiles(wdir,filemask=None):
+    fn,m = item
+    expected = _name_checksums(m)
+    return expected,checksum.file_digests(fn,expected.keys())
 
-    """ Analyse files in wdir for md5 correctness.
+def _mismatch(expected,computed,fn,where=''):
+    """ The error message of the checksums which do not match or None.
+    """
+    wrong = [a for a in sorted(expected) if computed.get(a) != expected[a]]
+    if not wrong:
+        return None
+    return 'Corrupted file%s? %s:  %s'%(where,fn,', '.join(['%s expected %s computed %s'%(a,repr(expected[a]),repr(computed.get(a))) for a in wrong]))
+
+def _report_corrupted(fn,m,expected,computed):
+    """ Report the corrupted hashfile fn (m is the match of its name); for a file with the seed in the name the
+    offset of the first corrupted byte is reported too and, if the block digests of the file were stored, the
+    corrupted ranges (also recorded as the 'hashfile_corruption' result).
+    """
+    from smashbox.utilities import seeded_content, block_digests
+
+    osize = os.path.getsize(fn)
+    message = _mismatch(expected,computed,fn)+' (observed size=%s)'%osize
+
+    # the expected size is only known from the block digests
+    sidecar = None
+    if 'md5' in expected:
+        sidecar = block_digests.load(expected['md5'])
+    nbytes = None
+    if sidecar is not None:
+        nbytes = sidecar[0]
+        message += ' (expected size=%s)'%nbytes
+
+    seed = m.groupdict().get('seed')
+    if seed:
+        offset = seeded_content.first_mismatch(fn,int(seed,16),nbytes)
+        if offset is None:
+            message += ', content matches the seed up to the end of file (truncated or extended?)'
+        elif nbytes is not None and offset == min(osize,nbytes) and osize != nbytes:
+            message += ', content matches the seed up to offset %d (%s)'%(offset,'truncated' if osize < nbytes else 'extended')
+        else:
+            message += ', first corrupted byte at offset %d'%offset
+
+    ranges = None
+    if sidecar is not None:
+        ranges = block_digests.localize(fn,expected['md5'],sidecar)
+    if ranges is not None:
+        for size in sorted(ranges,reverse=True):
+            message += '; blocks of %d: %s'%(size,block_digests.format_ranges(ranges[size]))
+        record_result('hashfile_corruption',{'path':fn,'expected':expected,'computed':computed,
+                                             'ranges':dict([(str(size),r) for size,r in ranges.items()])})
+
+    error_check(False, message)
+
+def analyse_hashfiles(wdir,filemask=None,nworkers=None):
+
+    """ Analyse files in wdir for md5 correctness (and of the other checksums in the filemask).
 
     If filemask is not provided, analyze all possible files found in wdir.
 
     If filemask is provided, analyze only the files which match the filemask pattern ('{md5}' gets replaced by '*')
+
+    The checksums are computed by nworkers threads (hashlib releases the GIL while hashing), by default
+    config.hashfile_verify_workers (1 means sequential).
     
     """
     
     import glob
-    import hashlib
 
     ncorrupt = 0
     nfiles = 0
     nanalysed = 0
 
-    import re
-
-    if filemask is None:
-        #match any names containing a block of 32 characters from hex character set
-        md5_regexp = '\S*([a-fA-F0-9]{32,32})\S*'
-    else:
-        # re.escape in order to allow *? in the filemask
-        # a block of 32 characters from hex character set comes in place of {md5} token
-        md5_regexp = re.escape(filemask).replace('\{md5\}','([a-fA-F0-9]{32,32})')
+    if nworkers is None:
+        nworkers = int(config.get('hashfile_verify_workers',1))
 
-    md5_pattern = re.compile(md5_regexp)
+    name_pattern = _name_pattern(filemask)
+    glob_pattern = _glob_pattern(filemask)
 
-    if filemask is None:
-        glob_pattern = "*"
-    else:
-        glob_pattern = filemask.replace('{md5}','*')
+    tocheck = []
 
-    
     for fn in glob.glob(os.path.normpath(os.path.join(wdir,glob_pattern))): 
 
         if not os.path.isfile(fn): 
@@ -184,55 +442,144 @@ def analyse_hashfiles(wdir,filemask=None):
 
         nfiles += 1
 
-        m = md5_pattern.match(os.path.basename(fn))
+        m = name_pattern.match(os.path.basename(fn))
 
         if m:
-            md5_name = m.group(1)
+            tocheck.append((fn,m))
         else:
             continue # cannot extract md5 from filename
 
-        nanalysed += 1
+    nanalysed = len(tocheck)
 
-        md5_data = md5sum(fn)
+    for (fn,m),(expected,computed) in zip(tocheck,_map_parallel(_verify,tocheck,nworkers)):
         
-        if md5_data!=md5_name:
-            osize = os.path.getsize(fn)
-            error_check(False, 'Corrupted file? %s:  md5 expected %s computed %s (observed size=%s)'%(fn,repr(md5_name),repr(md5_data),osize))
-            
+        if _mismatch(expected,computed,fn):
+            _report_corrupted(fn,m,expected,computed)
             ncorrupt += 1
 
     logger.info("Found %d files in %s: analysed %d, corrupted %d",nfiles,wdir,nanalysed,ncorrupt)
     
     return (nfiles,nanalysed,ncorrupt)
 
-def md5sum(fn):
-    import hashlib
-    md5 = hashlib.md5()
-        
-    f = file(fn,'rb')
-    
+def analyse_hashfiles_tree(wdir,filemask=None,nworkers=None,batch_size=1000):
+    """ Analyse the files in wdir and all its subdirectories for md5 (and other checksums) correctness, as
+    analyse_hashfiles.
+
+    The files are streamed from the directory walk and hashed in batches of batch_size files (by nworkers threads,
+    default config.hashfile_verify_workers) so the memory does not grow with the number of files.
+
+    Return (nfiles,nanalysed,ncorrupt,per_dir) where per_dir is the dict: relative directory path ->
+    (nfiles,nanalysed,ncorrupt).
+    """
+    import itertools
+
+    if nworkers is None:
+        nworkers = int(config.get('hashfile_verify_workers',1))
+
+    name_pattern = _name_pattern(filemask)
+
+    per_dir = {}
+
+    def check(batch):
+        results = _map_parallel(_verify,[(os.path.join(wdir,relpath),m) for relpath,m in batch],nworkers)
+        for (relpath,m),(expected,computed) in zip(batch,results):
+            counts = per_dir[os.path.dirname(relpath)]
+            fn = os.path.join(wdir,relpath)
+            if _mismatch(expected,computed,fn):
+                _report_corrupted(fn,m,expected,computed)
+                counts[2] += 1
+
+    def candidates():
+        for relpath in iter_files(wdir,filemask):
+            counts = per_dir.setdefault(os.path.dirname(relpath),[0,0,0])
+            counts[0] += 1
+            m = name_pattern.match(os.path.basename(relpath))
+            if m:
+                counts[1] += 1
+                yield relpath,m
+
+    files = candidates()
     while True:
-        chunk = f.read(BLOCK_SIZE)
-        if not chunk: break
-        md5.update(chunk)
+        batch = list(itertools.islice(files,batch_size))
+        if not batch:
+            break
+        check(batch)
 
-    f.close()
-        
-    return md5.hexdigest()
+    per_dir = dict([(d,tuple(c)) for d,c in per_dir.items()])
+    nfiles,nanalysed,ncorrupt = [sum(c[i] for c in per_dir.values()) for i in range(3)]
 
-def adler32(fn):
-    import zlib
-    v = 1L
-    f = file(fn,'rb')
+    for d in sorted(per_dir.keys()):
+        logger.info("  %s: %d files, analysed %d, corrupted %d",d or '.',*per_dir[d])
+    logger.info("Found %d files in %d directories below %s: analysed %d, corrupted %d",nfiles,len(per_dir),wdir,nanalysed,ncorrupt)
 
-    while True:
-        chunk = f.read(BLOCK_SIZE)
-        if not chunk: break
-        v = zlib.adler32(chunk,v)
-            
-    f.close()
+    return (nfiles,nanalysed,ncorrupt,per_dir)
+
+def _map_parallel(f,items,nworkers):
+    """ Return map(f,items) computed by a pool of nworkers threads (in the calling thread if nworkers<=1).
+    """
+    if nworkers <= 1 or len(items) <= 1:
+        return map(f,items)
+
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(min(nworkers,len(items)))
+    try:
+        return pool.map(f,items,chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def analyse_hashfiles_on_server(path,filemask=None,user_num=None):
+    """ Analyse the hashfiles in the folder of the test account on the server (path relative to the files of the
+    account) for md5 correctness (and of the other checksums in the filemask). All files are hashed on the server
+    in a single call (get_checksums_on_server).
+
+    Return (nfiles,nanalysed,ncorrupt) as analyse_hashfiles.
+    """
+    ncorrupt = 0
+    nfiles = 0
+    nanalysed = 0
+
+    name_pattern = _name_pattern(filemask)
+
+    account = config.oc_account_name
+    if user_num is not None:
+        account = "%s%i" % (account, user_num)
+
+    pattern = os.path.join(account, 'files', path.strip('/'), _glob_pattern(filemask))
+
+    for f in get_checksums_on_server([pattern],_filemask_algorithms(filemask)):
+
+        if os.path.basename(f['path']) in config.ignored_files:
+            continue
 
-    return '%x' % (v & 0xffffffffL)
+        nfiles += 1
+
+        m = name_pattern.match(os.path.basename(f['path']))
+
+        if not m:
+            continue # cannot extract md5 from filename
+
+        nanalysed += 1
+
+        expected = _name_checksums(m)
+        computed = dict([(a,f.get(a,f.get('error'))) for a in expected])
+        message = _mismatch(expected,computed,f['path'],' on the server')
+        if message:
+            error_check(False, message+' (observed size=%s)'%f.get('size'))
+            ncorrupt += 1
+
+    logger.info("Found %d files in %s on the server: analysed %d, corrupted %d",nfiles,path,nanalysed,ncorrupt)
+
+    return (nfiles,nanalysed,ncorrupt)
+
+def md5sum(fn):
+    from smashbox.utilities import checksum
+    return checksum.file_digest(fn, 'md5')
+
+def adler32(fn):
+    from smashbox.utilities import checksum
+    return checksum.file_digest(fn, 'adler32')
 
 # TO BE REVIEWED...
 
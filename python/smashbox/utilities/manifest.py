@@ -0,0 +1,170 @@
+
+from smashbox.utilities import *
+
+# snapshots of local directory trees and their differences
+#
+# a manifest is a dict: relative path -> (type, size, mtime, digest) where type is 'f' (file), 'd' (directory)
+# or 'l' (symlink) and the digest is the md5 checksum of a file (or None if not requested); the tree is walked once
+# with scandir (the stat information comes with the directory listing on most platforms)
+#
+# python 2 has no os.scandir: the scandir backport (requirements.txt) streams the directory entries; without it the
+# entries of each directory are listed at once with os.listdir, so the memory is not bounded for huge directories
+#
+# the manifests of two states of a tree (e.g. the final states of two workers) are compared in linear time
+
+import json
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+import stat as _stat
+
+
+def _ignored():
+    return set(config.get('ignored_files', []))
+
+
+def iter_tree(top, ignored=None):
+    """ Walk the tree below top (not following symlinks) and yield (relpath, type, lstat) of all entries.
+    The names in ignored (default config.ignored_files) are skipped. The entries of a directory are yielded before
+    the entries of its subdirectories.
+    """
+    if ignored is None:
+        ignored = _ignored()
+
+    stack = ['']
+    while stack:
+        rel = stack.pop()
+        d = os.path.join(top, rel)
+        if scandir is not None:
+            entries = ((e.name, e.path, e) for e in scandir(d))  # streamed: huge directories are not listed in memory
+        else:
+            entries = [(name, os.path.join(d, name), None) for name in os.listdir(d)]
+        for name, path, entry in entries:
+            if name in ignored:
+                continue
+            if entry is not None:
+                st = entry.stat(follow_symlinks=False)
+            else:
+                st = os.lstat(path)
+            relpath = os.path.join(rel, name)
+            if _stat.S_ISDIR(st.st_mode):
+                stack.append(relpath)
+                yield relpath, 'd', st
+            elif _stat.S_ISLNK(st.st_mode):
+                yield relpath, 'l', st
+            else:
+                yield relpath, 'f', st
+
+
+def snapshot(top, digest=False, ignored=None):
+    """ Return the manifest of the tree below top. If digest is True then the md5 checksums of the files are
+    computed (see smashbox.utilities.checksum, unchanged files are not re-read).
+    """
+    from smashbox.utilities import checksum
+
+    t0 = time.time()
+    manifest = {}
+    for relpath, t, st in iter_tree(top, ignored):
+        if t == 'd':
+            manifest[relpath] = (t, 0, None, None)
+            continue
+        md5 = None
+        if digest and t == 'f':
+            md5 = checksum.file_digest(os.path.join(top, relpath))
+        manifest[relpath] = (t, st.st_size, st.st_mtime, md5)
+
+    logger.info('snapshot of %s: %d entries in %.3fs', top, len(manifest), time.time()-t0)
+    return manifest
+
+
+def save_manifest(manifest, fn):
+    json.dump(manifest, open(fn, 'w'))
+
+
+def _utf8(x):
+    if isinstance(x, unicode):
+        return x.encode('utf-8')
+    return x
+
+
+def load_manifest(fn):
+    """ Load the manifest saved by save_manifest(). The paths and the strings are utf-8 encoded str (json returns
+    unicode) as in the manifests of snapshot().
+    """
+    return dict([(_utf8(k), tuple([_utf8(x) for x in v])) for k, v in json.load(open(fn)).items()])
+
+
+def _content_key(entry):
+    t, size, mtime, md5 = entry
+    if md5 is not None:
+        return (t, size, md5)
+    return (t, size, mtime)
+
+
+def diff(old, new, compare_mtime=True):
+    """ Compare two manifests and return a dict with the sorted lists of 'added', 'removed' and 'modified' paths
+    and of the 'renamed' (old path, new path) files.
+
+    A file is modified if its type, size or digest (if present in both manifests) differ, or its mtime if
+    compare_mtime is True (the mtimes of two different trees, e.g. of two sync clients, need not be the same).
+    A removed file and an added file with the same content (digest or, without digests, size and mtime) are
+    reported as renamed if the match is unique.
+    """
+    added = [p for p in new if p not in old]
+    removed = [p for p in old if p not in new]
+
+    modified = []
+    for p, o in old.iteritems():
+        n = new.get(p)
+        if n is None:
+            continue
+        if o[0] != n[0] or o[0] == 'f' and (o[1] != n[1] or o[3] is not None and n[3] is not None and o[3] != n[3]
+                                           or compare_mtime and o[2] != n[2]):
+            modified.append(p)
+
+    # pair the removed and added files with the same content
+    removed_by_key = {}
+    for p in removed:
+        if old[p][0] == 'f':
+            removed_by_key.setdefault(_content_key(old[p]), []).append(p)
+    added_by_key = {}
+    for p in added:
+        if new[p][0] == 'f':
+            added_by_key.setdefault(_content_key(new[p]), []).append(p)
+
+    renamed = []
+    for key, paths in added_by_key.iteritems():
+        if len(paths) == 1 and len(removed_by_key.get(key, [])) == 1:
+            renamed.append((removed_by_key[key][0], paths[0]))
+
+    renamed_old = set([r[0] for r in renamed])
+    renamed_new = set([r[1] for r in renamed])
+
+    return {'added': sorted([p for p in added if p not in renamed_new]),
+            'removed': sorted([p for p in removed if p not in renamed_old]),
+            'modified': sorted(modified),
+            'renamed': sorted(renamed)}
+
+
+def is_same(d):
+    """ True if the diff reports no differences.
+    """
+    return not (d['added'] or d['removed'] or d['modified'] or d['renamed'])
+
+
+def log_diff(d, name=''):
+    """ Log the summary and the paths of the diff.
+    """
+    logger.info('%sdiff: %d added, %d removed, %d modified, %d renamed', name and name+' ', len(d['added']),
+                len(d['removed']), len(d['modified']), len(d['renamed']))
+    for kind in ['added', 'removed', 'modified']:
+        for p in d[kind]:
+            logger.info('  %s: %s', kind, p)
+    for o, n in d['renamed']:
+        logger.info('  renamed: %s -> %s', o, n)
@@ -0,0 +1,119 @@
+
+# parser of the owncloudcmd logs (<worker>-ocsync.stepNN.cntNNN.log files in the rundir)
+#
+# a sync run is turned into a dict of metrics:
+#
+#  files_up, files_down     : number of distinct files uploaded and downloaded (a file propagated several times in
+#                             one run, e.g. after a restart, is counted once, as in bytes_up/bytes_down)
+#  files_other              : number of other propagation jobs (mkdir, delete, move, ...)
+#  bytes_up, bytes_down     : size of the uploaded and downloaded files (as found in the local folder after the sync)
+#  discovery_ms             : time spent in the discovery phase (as reported by the client)
+#  reconcile_ms             : time spent in the reconcile phase (as reported by the client)
+#  propagation_ms           : time spent in the propagation phase (as reported by the client)
+#  errors                   : number of failed propagation jobs (also the completed ones with an error status)
+#                             and fatal sync errors
+#  retries                  : number of times the client restarted the sync within one run
+#
+# the log lines are matched with the same patterns for 1.x clients (qDebug style with quoted strings)
+# and 2.x clients (categorized logging):
+#
+#  1.x: ... "Completed propagation of" "a.dat" "by" OCC::PropagateUploadFileQNAM(0x1234) "with status" 4
+#  2.x: ... [ info sync.propagator ]: Completed propagation of "a.dat" by OCC::PropagateUploadFileNG(0x1234) with status 4
+#  both: ... #### Discovery end #################################################### 123 ms
+
+import os
+import re
+
+_phase_pattern = re.compile(r'#### (Discovery|Reconcile|Propagation) end #*\s*(\d+)\s*ms')
+_completed_pattern = re.compile(r'Completed propagation of"?\s+"(.*?)"\s+"?by"?\s+(?:OCC::)?(\w+)(?:.*?with status"?\s+(\d+))?')
+_failed_pattern = re.compile(r'Could not complete propagation of"?\s+"(.*?)"\s+"?by"?\s+(?:OCC::)?(\w+)')
+_restart_pattern = re.compile(r'Restarting [Ss]ync')
+_fatal_pattern = re.compile(r'finished with ERROR|\[ (?:critical|fatal) ')
+
+# the status of a completed propagation job (SyncFileItem::Status of the client): FatalError, NormalError, SoftError
+# (0 is NoStatus, 4 is Success, the others are conflicts, ignored files and restorations)
+ERROR_STATUSES = [1, 2, 3]
+
+METRICS = ['files_up', 'files_down', 'files_other', 'bytes_up', 'bytes_down',
+           'discovery_ms', 'reconcile_ms', 'propagation_ms', 'errors', 'retries']
+
+
+def empty_metrics():
+    return dict([(m, 0) for m in METRICS])
+
+
+def _direction(job):
+    if job.startswith('PropagateUpload'):
+        return 'up'
+    if job.startswith('PropagateDownload'):
+        return 'down'
+    return 'other'
+
+
+def parse_ocsync_log(fn, local_folder=None):
+    """ Parse the owncloudcmd log file fn and return a dict of metrics (see METRICS).
+
+    The file is read line by line so the memory usage does not depend on the size of the log.
+
+    If local_folder is given then the bytes_up/bytes_down are computed from the size of the
+    propagated files in the local_folder (the client does not log the transfer sizes).
+    """
+
+    metrics = empty_metrics()
+
+    if not os.path.exists(fn):
+        return metrics
+
+    propagated = {'up': set(), 'down': set()}
+
+    with open(fn) as f:
+        for line in f:
+            if '####' in line:
+                m = _phase_pattern.search(line)
+                if m:
+                    metrics[m.group(1).lower()+'_ms'] += int(m.group(2))
+                continue
+
+            m = _completed_pattern.search(line)
+            if m:
+                if m.group(3) is not None and int(m.group(3)) in ERROR_STATUSES:
+                    metrics['errors'] += 1
+                    continue
+                direction = _direction(m.group(2))
+                if direction == 'other':
+                    metrics['files_other'] += 1
+                else:
+                    propagated[direction].add(m.group(1))
+                continue
+
+            if _failed_pattern.search(line) or _fatal_pattern.search(line):
+                metrics['errors'] += 1
+                continue
+
+            if _restart_pattern.search(line):
+                metrics['retries'] += 1
+
+    for direction in ['up', 'down']:
+        metrics['files_'+direction] = len(propagated[direction])
+
+    if local_folder is not None:
+        for direction in ['up', 'down']:
+            for path in propagated[direction]:
+                try:
+                    metrics['bytes_'+direction] += os.path.getsize(os.path.join(local_folder, path))
+                except OSError:
+                    pass  # removed or renamed in the meantime
+
+    return metrics
+
+
+def throughput(metrics, elapsed):
+    """ Add the throughput (MB/s and files/s) to the metrics of a sync run which took elapsed seconds.
+    """
+    metrics['elapsed'] = elapsed
+    if elapsed > 0:
+        metrics['mb_per_s'] = (metrics['bytes_up']+metrics['bytes_down'])/elapsed/1000000.
+        metrics['files_per_s'] = (metrics['files_up']+metrics['files_down'])/elapsed
+    else:
+        metrics['mb_per_s'] = metrics['files_per_s'] = 0.
+    return metrics
@@ -0,0 +1,144 @@
+
+from smashbox.utilities import *
+
+# bulk provisioning of test users and groups on the server
+#
+# the operations (delete, create, login, group membership) of many users or groups are run by a bounded
+# pool of threads, optionally rate limited (operations per second) and with a retry of failed operations
+#
+# the behaviour is controlled by these config options:
+#
+#  oc_provisioning_workers : number of threads (default 8)
+#  oc_provisioning_rate    : maximum number of operations per second, None means unlimited (default None)
+#  oc_provisioning_retries : number of retries of a failed operation (default 3)
+
+import threading
+
+
+class RateLimiter:
+    """ Allow at most rate calls of wait() per second (shared by all threads). No limit if rate is None or 0.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_time = time.time()
+
+    def wait(self):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.time()
+            t = max(now, self.next_time)
+            self.next_time = t + 1.0/self.rate
+        if t > now:
+            time.sleep(t - now)
+
+
+def run_operations(name, operations, items, nworkers=None, rate=None, retries=None, retry_delay=1.0):
+    """ Apply the sequence of operations (functions of one argument) to each of the items with a pool of nworkers threads.
+
+    Every operation call waits for the rate limiter and is retried up to retries times (with an exponential
+    backoff starting at retry_delay seconds). The operations of one item run in order.
+
+    Return the statistics of the run: number of items and operations, failures, elapsed time and throughput.
+    The statistics are logged and recorded in the run results. If any item failed then the first error is raised
+    after all items have been processed.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    if nworkers is None:
+        nworkers = int(config.get('oc_provisioning_workers', 8))
+    if rate is None:
+        rate = config.get('oc_provisioning_rate', None)
+    if retries is None:
+        retries = int(config.get('oc_provisioning_retries', 3))
+
+    limiter = RateLimiter(rate)
+    nretries = [0]
+    lock = threading.Lock()
+
+    def _call(op, item):
+        for attempt in range(retries+1):
+            limiter.wait()
+            try:
+                return op(item)
+            except Exception, x:
+                if attempt == retries:
+                    raise
+                logger.warning('%s: %s(%s) failed (%s), retrying', name, op.__name__, item, x)
+                with lock:
+                    nretries[0] += 1
+                time.sleep(retry_delay * 2**attempt)
+
+    def _process(item):
+        try:
+            for op in operations:
+                _call(op, item)
+            return None
+        except Exception, x:
+            logger.error('%s: %s failed: %s', name, item, x)
+            return x
+
+    logger.info('%s: %d items, %d operations each, nworkers=%d rate=%s', name, len(items), len(operations), nworkers, rate)
+
+    t0 = time.time()
+    if items:
+        pool = ThreadPool(max(1, min(nworkers, len(items))))
+        try:
+            errors = pool.map(_process, items, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        errors = []
+    elapsed = time.time() - t0
+
+    failures = [e for e in errors if e is not None]
+    nops = len(items)*len(operations)
+
+    stats = {'name': name, 'nitems': len(items), 'noperations': nops, 'nfailed': len(failures), 'nretries': nretries[0],
+             'nworkers': nworkers, 'elapsed': elapsed,
+             'items_per_s': len(items)/elapsed if elapsed else 0., 'operations_per_s': nops/elapsed if elapsed else 0.}
+
+    logger.info('%(name)s: %(nitems)d items (%(noperations)d operations) in %(elapsed).2fs: %(items_per_s).1f items/s, '
+                '%(operations_per_s).1f operations/s, %(nfailed)d failed, %(nretries)d retries', stats)
+    record_result('provisioning', stats)
+
+    if failures:
+        raise failures[0]
+
+    return stats
+
+
+def provision_users(usernames, password=None, **kwds):
+    """ Delete, create and login (to generate the encryption keys) the users on the server.
+    """
+    if password is None:
+        password = config.oc_account_password
+
+    def delete(username):
+        delete_owncloud_account(username)
+
+    def create(username):
+        create_owncloud_account(username, password)
+
+    def login(username):
+        login_owncloud_account(username, password)
+
+    return run_operations('provision_users', [delete, create, login], usernames, **kwds)
+
+
+def provision_groups(group_names, **kwds):
+    """ Delete and create the groups on the server.
+    """
+    return run_operations('provision_groups', [delete_owncloud_group, create_owncloud_group], group_names, **kwds)
+
+
+def provision_group_members(members, **kwds):
+    """ Add users to groups: members is a list of (username, group_name) tuples.
+    """
+    def add(member):
+        add_user_to_group(*member)
+
+    return run_operations('provision_group_members', [add], members, **kwds)
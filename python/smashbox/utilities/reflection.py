@@ -20,6 +20,15 @@ def getCurrentStep():
         return None
     return _smash_.steps[getWorkerNumber()]
 
+def getSupervisorStep():
+    """ Get the step of the supervisor: the highest step which all workers have entered (or None before the workers
+    are started).
+    """
+    try:
+        return _smash_.supervisor_step.value
+    except AttributeError:
+        return None
+
 def getSharedObject():
     """ Get the object which allows to share state between worker processes.
     """
@@ -0,0 +1,106 @@
+
+from smashbox.utilities import *
+
+# reproducible file content: every 4KB page of the content is a function of (seed, page number)
+#
+# a page is a 16 byte tag (md5 of the seed and the page number) followed by a slice of a random tile of the seed
+# at an offset given by the tag; every page of a file is different (so duplicated, shifted or swapped ranges
+# are visible) and the expected content of any range may be regenerated from the seed alone, e.g. to report
+# the byte offset of the first corrupted byte in a file
+
+import binascii
+import hashlib
+import random
+import struct
+
+PAGE_SIZE = 4096
+TILE_SIZE = 64*1024 + PAGE_SIZE
+
+_unpack_offset = struct.Struct('<I').unpack_from
+
+_tiles = {}  # seed -> tile (a few most recent)
+
+
+def new_seed():
+    """ Return a new random 64 bit seed.
+    """
+    return struct.unpack('<Q', os.urandom(8))[0]
+
+
+def format_seed(seed):
+    """ The seed as it appears in the file names ({seed} token of the filemask).
+    """
+    return '%016x' % seed
+
+
+def _tile(seed):
+    tile = _tiles.get(seed)
+    if tile is None:
+        n = random.Random(seed).getrandbits(TILE_SIZE*8)
+        tile = binascii.unhexlify('%0*x' % (TILE_SIZE*2, n))
+        if len(_tiles) > 16:
+            _tiles.clear()
+        _tiles[seed] = tile
+    return tile
+
+
+def pages(seed, first, last):
+    """ Return the content of the pages first..last-1 of the seed.
+    """
+    tile = _tile(seed)
+    n = TILE_SIZE - PAGE_SIZE
+    md5 = hashlib.md5
+    out = []
+    for p in xrange(first, last):
+        tag = md5('%x:%x' % (seed, p)).digest()
+        o = _unpack_offset(tag)[0] % n
+        out.append(tag)
+        out.append(tile[o:o+PAGE_SIZE-len(tag)])
+    return ''.join(out)
+
+
+def generate(seed, offset, nbytes, chunk_size=1024*1024):
+    """ Yield the content of the seed from offset to offset+nbytes in chunks of about chunk_size bytes.
+    """
+    npages = max(1, chunk_size // PAGE_SIZE)
+    end = offset + nbytes
+    while offset < end:
+        first = offset // PAGE_SIZE
+        last = min(first + npages, (end - 1) // PAGE_SIZE + 1)
+        data = pages(seed, first, last)
+        start = offset - first*PAGE_SIZE
+        data = data[start:start + end - offset]
+        offset += len(data)
+        yield data
+
+
+def first_mismatch(fn, seed, nbytes=None, chunk_size=1024*1024):
+    """ Compare the file with the content of the seed and return the byte offset of the first difference or None.
+
+    If nbytes (the expected size) is given and the file is shorter or longer then the offset is the end of the
+    shorter of the two (unless a difference comes before).
+    """
+    f = open(fn, 'rb')
+    try:
+        offset = 0
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            n = len(data)
+            if nbytes is not None:
+                n = min(n, nbytes - offset)
+            expected = ''.join(generate(seed, offset, n))
+            if data[:n] != expected:
+                i = 0
+                while data[i] == expected[i]:
+                    i += 1
+                return offset + i
+            offset += n
+            if nbytes is not None and n < len(data):
+                return offset  # the file is longer than expected
+        if nbytes is not None and offset != nbytes:
+            return offset  # the file is shorter than expected
+        return None
+    finally:
+        f.close()
@@ -0,0 +1,546 @@
+
+from smashbox.utilities import *
+
+# scanning of the owncloud server log (owncloud.log in oc_server_datadirectory)
+#
+# reset_server_log_file() records the current size of the log at the beginning of the test and only the bytes
+# appended since then are read afterwards; the log is streamed (from the local file or over ssh as oc_server_log_user)
+# and scanned in a single pass for all patterns at once (config.oc_server_log_patterns)
+
+import re
+
+# case-insensitive regular expressions of known problems in the server log
+DEFAULT_PATTERNS = ["integrity constraint violation", "Exception", "could not obtain lock", "db error", "stat failed"]
+
+# read size of the log stream
+READ_SIZE = 4*1024*1024
+
+
+def server_log_path():
+    return os.path.join(config.oc_server_datadirectory, 'owncloud.log')
+
+
+def _is_local():
+    return not config.oc_server_shell_cmd.strip()
+
+
+def log_shell_cmd():
+    """ The command prefix to run commands on the server as the user which can read the log (oc_server_log_user).
+    """
+    return 'ssh -p %d %s@%s' % (config.get('scp_port', 22), config.get('oc_server_log_user', 'root'), config.oc_server)
+
+
+def server_log_size():
+    """ Return the current size of the server log (0 if it does not exist).
+    """
+    if _is_local():
+        try:
+            return os.path.getsize(server_log_path())
+        except OSError:
+            return 0
+
+    from smashbox.utilities import server_shell
+
+    rc, output = server_shell.run('stat -c %%s %s' % server_log_path(), shell_cmd=log_shell_cmd())
+    try:
+        return int(output.split()[-1])
+    except (ValueError, IndexError):
+        return 0
+
+
+class _ChunkReader:
+    """ File-like read() of the chunks yielded by a generator (the size argument is only a hint).
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def read(self, size=-1):
+        for chunk in self.chunks:
+            if chunk:
+                return chunk
+        return ''
+
+
+def open_server_log(offset=0):
+    """ Return (stream, close) where the stream yields the content of the server log from offset on.
+    If the local log is shorter than offset (it was rotated) then it is read from the beginning.
+    The remote log is read through the persistent server shell channel (see server_shell).
+    """
+    if _is_local():
+        try:
+            f = open(server_log_path(), 'rb')
+        except IOError, x:
+            logger.warning('cannot open server log: %s', x)
+            import cStringIO
+            f = cStringIO.StringIO()
+        else:
+            if os.fstat(f.fileno()).st_size >= offset:
+                f.seek(offset)
+        return f, f.close
+
+    if config.get('oc_server_shell_persistent', True):
+        from smashbox.utilities import server_shell
+        chunks = server_shell.get_channel(log_shell_cmd()).stream('tail -c +%d %s' % (offset+1, server_log_path()))
+        return _ChunkReader(chunks), chunks.close
+
+    cmd = '%s tail -c +%d %s' % (log_shell_cmd(), offset+1, server_log_path())
+    logger.info('running %s', repr(cmd))
+    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, bufsize=READ_SIZE)
+
+    def close():
+        process.stdout.close()
+        process.wait()
+
+    return process.stdout, close
+
+
+class LogScanner:
+    """ Count the lines of the log matching each of the patterns (case-insensitive regular expressions) in a single pass.
+
+    The data is fed in chunks of any size. Only the lines matching the combined pattern are looked at line by line,
+    so the cost of scanning is close to one regex search over the whole data. The combined pattern is searched in the
+    lowercased data: case-insensitive matching (re.IGNORECASE) is several times slower and is only used if some pattern
+    contains escapes (which cannot be lowercased).
+    """
+
+    def __init__(self, patterns=None):
+        if patterns is None:
+            patterns = config.get('oc_server_log_patterns', DEFAULT_PATTERNS)
+        self.patterns = list(patterns)
+        self.regexps = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+        flags = 0
+        if [p for p in self.patterns if '\\' in p]:
+            flags = re.IGNORECASE
+        self.combined = re.compile('|'.join(['(?:%s)' % (p if '\\' in p else p.lower()) for p in self.patterns]), flags)
+        self.counts = dict([(p, 0) for p in self.patterns])
+        self.first = dict([(p, None) for p in self.patterns])
+        self.nbytes = 0
+        self.nlines = 0
+        self._rest = ''
+
+    def feed(self, data):
+        """ Scan the next chunk of the log (an incomplete last line is kept for the next chunk).
+        """
+        buf = self._rest + data
+        end = buf.rfind('\n') + 1
+        self._rest = buf[end:]
+        self._scan(buf, end)
+
+    def finish(self):
+        """ Scan the remaining incomplete line and return the results (see results()).
+        """
+        if self._rest:
+            buf, self._rest = self._rest, ''
+            self._scan(buf, len(buf))
+        return self.results()
+
+    def _scan(self, buf, end):
+        lowered = buf.lower()  # same length and offsets (bytes)
+        pos = 0
+        lineno = self.nlines # number of lines before buf[pos]
+        while pos < end:
+            m = self.combined.search(lowered, pos, end)
+            if not m:
+                break
+            start = buf.rfind('\n', 0, m.start()) + 1
+            stop = buf.find('\n', m.end(), end)
+            if stop < 0:
+                stop = end
+            lineno += buf.count('\n', pos, start)
+            self.match_line(buf[start:stop], lineno+1, self.nbytes+start)
+            pos = stop + 1
+            lineno += 1
+        self.nlines += buf.count('\n', 0, end) + (end > 0 and buf[end-1] != '\n')
+        self.nbytes += end
+
+    def match_line(self, line, lineno, offset):
+        """ Count the line (lineno and byte offset in the scanned data) for all patterns which it matches.
+        Return the list of matched patterns.
+        """
+        matched = []
+        for p, r in zip(self.patterns, self.regexps):
+            if r.search(line):
+                self.counts[p] += 1
+                if self.first[p] is None:
+                    self.first[p] = {'line': lineno, 'offset': offset, 'text': line[:1000]}
+                matched.append(p)
+        return matched
+
+    def results(self):
+        """ Return a dict: {pattern: {'count': N, 'first': {'line','offset','text'} or None}}.
+        """
+        return dict([(p, {'count': self.counts[p], 'first': self.first[p]}) for p in self.patterns])
+
+
+def scan_server_log(offset=None, copy_to=None, patterns=None, analyzer=None):
+    """ Scan the server log from offset (by default the offset recorded by reset_server_log_file) for the patterns.
+
+    If copy_to is given then the scanned part of the log is also saved in this file. If analyzer is given (e.g.
+    a RequestAnalyzer) then it is fed the same data in the same pass.
+    Return the results of LogScanner.
+    """
+    if offset is None:
+        offset = config.get('_oc_server_log_offset', 0)
+
+    scanner = LogScanner(patterns)
+
+    stream, close = open_server_log(offset)
+    copy = None
+    if copy_to:
+        copy = open(copy_to, 'wb')
+    try:
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            if copy:
+                copy.write(data)
+            scanner.feed(data)
+            if analyzer:
+                analyzer.feed(data)
+    finally:
+        close()
+        if copy:
+            copy.close()
+
+    results = scanner.finish()
+    logger.info('scanned %d bytes (%d lines) of the server log from offset %d', scanner.nbytes, scanner.nlines, offset)
+    return results
+
+
+# ###### REQUEST ANALYTICS ############
+
+import json
+import calendar
+import math
+
+# "2017-05-10T10:12:13+00:00" or with fractions of seconds "2017-05-10T10:12:13.123456+00:00"
+_time_re = re.compile(r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(\.\d+)?')
+
+# fields of the log records with an explicit duration of the request (seconds or milliseconds)
+DURATION_FIELDS = [('duration', 1.), ('durationMs', 1e-3)]
+
+
+def parse_time(t):
+    """ Return the time of the log record in seconds since the epoch (the time zone is ignored) or None.
+    """
+    m = _time_re.match(t or '')
+    if not m:
+        return None
+    g = m.groups()
+    secs = calendar.timegm([int(x) for x in g[:6]] + [0, 0, 0])
+    if g[6]:
+        secs += float(g[6])
+    return secs
+
+
+def endpoint(method, url):
+    """ Normalize the request to an endpoint: the method and the url path up to the name of the dav/ocs service
+    (e.g. "PROPFIND /remote.php/webdav", "MOVE /remote.php/dav/files"); the numeric components of other urls are
+    replaced by {id}.
+    """
+    path = (url or '').split('?')[0]
+    parts = path.split('/')
+    for script, depth in [('remote.php', 2), ('public.php', 2), ('ocs', 7)]:
+        if script in parts:
+            i = parts.index(script)
+            if parts[i+1:i+2] == ['dav']:
+                depth += 1
+            parts = parts[:i+depth]
+            break
+    parts = ['{id}' if p.isdigit() else p for p in parts]
+    return '%s %s' % (method or '-', '/'.join(parts) or '/')
+
+
+def percentile(values, q):
+    """ Return the q-th percentile (0-100) of the sorted list of values (nearest rank) or None if empty.
+    """
+    if not values:
+        return None
+    k = max(0, min(len(values)-1, int(math.ceil(q/100.*len(values)))-1))
+    return values[k]
+
+
+class RequestAnalyzer:
+    """ Group the json records of the server log by request (reqId) and compute the number of requests, the error
+    rate and the latency percentiles of each endpoint.
+
+    The latency of a request is the explicit duration if a record has one (DURATION_FIELDS) or otherwise the time
+    span between its first and last record (only for requests with more than one record). The resolution of the
+    log time is one second unless the server logs the fractions of seconds (logdateformat).
+    """
+
+    def __init__(self, error_level=3):
+        self.error_level = error_level
+        self.requests = {}  # reqId -> [endpoint, first time, last time, max level, duration]
+        self.nrecords = 0
+        self.nskipped = 0
+        self._rest = ''
+
+    def feed(self, data):
+        buf = self._rest + data
+        end = buf.rfind('\n') + 1
+        self._rest = buf[end:]
+        for line in buf[:end].splitlines():
+            self.add_line(line)
+
+    def add_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            rec = json.loads(line)
+            req_id = rec['reqId']
+        except (ValueError, KeyError, TypeError):
+            self.nskipped += 1
+            return
+
+        self.nrecords += 1
+        t = parse_time(rec.get('time'))
+        try:
+            level = int(rec.get('level', 0))
+        except (ValueError, TypeError):
+            level = 0
+
+        duration = None
+        for field, unit in DURATION_FIELDS:
+            if field in rec:
+                try:
+                    duration = float(rec[field])*unit
+                except (ValueError, TypeError):
+                    pass
+
+        r = self.requests.get(req_id)
+        if r is None:
+            self.requests[req_id] = [endpoint(rec.get('method'), rec.get('url')), t, t, level, duration]
+            return
+        if t is not None:
+            if r[1] is None or t < r[1]:
+                r[1] = t
+            if r[2] is None or t > r[2]:
+                r[2] = t
+        r[3] = max(r[3], level)
+        if duration is not None:
+            r[4] = max(r[4], duration)
+
+    def finish(self):
+        if self._rest:
+            self.add_line(self._rest)
+            self._rest = ''
+        return self.results()
+
+    def results(self):
+        """ Return a dict: {endpoint: {'requests', 'errors', 'error_rate', 'timed', 'p50', 'p90', 'p99', 'max'}}
+        (latencies in seconds, None if no request of the endpoint is timed).
+        """
+        endpoints = {}
+        for ep, t0, t1, level, duration in self.requests.values():
+            e = endpoints.setdefault(ep, {'requests': 0, 'errors': 0, 'latencies': []})
+            e['requests'] += 1
+            if level >= self.error_level:
+                e['errors'] += 1
+            if duration is None and t0 is not None and t1 > t0:
+                duration = t1 - t0
+            if duration is not None:
+                e['latencies'].append(duration)
+
+        results = {}
+        for ep, e in endpoints.items():
+            latencies = sorted(e['latencies'])
+            results[ep] = {'requests': e['requests'], 'errors': e['errors'],
+                           'error_rate': float(e['errors'])/e['requests'], 'timed': len(latencies),
+                           'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90),
+                           'p99': percentile(latencies, 99), 'max': latencies[-1] if latencies else None}
+        return results
+
+
+def analyse_requests(fn=None, offset=0):
+    """ Stream the log file fn (e.g. the copy of the server log in a rundir) or the server log from offset through
+    a RequestAnalyzer and return its results.
+    """
+    analyzer = RequestAnalyzer()
+
+    if fn:
+        stream = open(fn, 'rb')
+        close = stream.close
+    else:
+        stream, close = open_server_log(offset)
+    try:
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            analyzer.feed(data)
+    finally:
+        close()
+
+    results = analyzer.finish()
+    logger.info('analysed %d records (%d requests, %d lines skipped) of the server log', analyzer.nrecords, len(analyzer.requests), analyzer.nskipped)
+    return results
+
+
+def format_request_stats(results):
+    """ Return the per-endpoint results of RequestAnalyzer as a table (text lines), the busiest endpoints first.
+    """
+    def fmt(x):
+        if x is None:
+            return '-'
+        return '%.3f' % x
+
+    lines = ['%-60s %8s %7s %7s %8s %8s %8s %8s' % ('endpoint', 'requests', 'errors', 'err%', 'p50', 'p90', 'p99', 'max')]
+    for ep in sorted(results.keys(), key=lambda ep: -results[ep]['requests']):
+        r = results[ep]
+        lines.append('%-60s %8d %7d %7.1f %8s %8s %8s %8s' % (ep, r['requests'], r['errors'], 100*r['error_rate'],
+                                                             fmt(r['p50']), fmt(r['p90']), fmt(r['p99']), fmt(r['max'])))
+    return lines
+
+
+# ###### LIVE TAILING ############
+
+import threading
+
+# the log level of the owncloud.log json records: 0 debug, 1 info, 2 warning, 3 error, 4 fatal
+# (the first level field of each line, the message of a record may contain another one)
+_level_re = re.compile(r'^[^\n]*?"level"\s*:\s*([0-4])', re.MULTILINE)
+
+LEVEL_NAMES = {'2': 'warnings', '3': 'errors', '4': 'fatals'}
+
+
+class _StepScanner(LogScanner):
+    """ LogScanner which also counts the matched lines per step (the step active when the data was fed).
+    """
+
+    def __init__(self, patterns=None, max_matches=1000):
+        LogScanner.__init__(self, patterns)
+        self.step = None
+        self.per_step = {}
+        self.matches = []
+        self.max_matches = max_matches
+
+    def step_counts(self, step):
+        if step not in self.per_step:
+            self.per_step[step] = {'patterns': {}, 'warnings': 0, 'errors': 0, 'fatals': 0}
+        return self.per_step[step]
+
+    def feed_step(self, data, step):
+        self.step = step
+        self.feed(data)
+
+    def _scan(self, buf, end):
+        # the levels are counted per complete line (a record may be split between the chunks)
+        counts = self.step_counts(self.step)
+        for level in _level_re.findall(buf, 0, end):
+            if level in LEVEL_NAMES:
+                counts[LEVEL_NAMES[level]] += 1
+        LogScanner._scan(self, buf, end)
+
+    def match_line(self, line, lineno, offset):
+        matched = LogScanner.match_line(self, line, lineno, offset)
+        if matched:
+            counts = self.step_counts(self.step)['patterns']
+            for p in matched:
+                counts[p] = counts.get(p, 0) + 1
+            if len(self.matches) < self.max_matches:
+                self.matches.append({'step': self.step, 'line': lineno, 'patterns': matched, 'text': line[:1000]})
+            logger.info('server log (step %s): %s', self.step, line[:1000])
+        return matched
+
+
+class LogTailer(threading.Thread):
+    """ Follow the server log from offset in a background thread while the test is running.
+
+    Each chunk of the log is tagged with the step returned by step_fn() when the chunk arrived, so that the server
+    problems (the patterns and the warning/error levels of the log records) are counted per test step.
+    The local log is polled every interval seconds; the remote log is followed with 'tail -F' over ssh.
+    """
+
+    def __init__(self, step_fn, offset=0, patterns=None, interval=None):
+        threading.Thread.__init__(self, name='server_log_tailer')
+        self.daemon = True
+        self.step_fn = step_fn
+        self.offset = offset
+        if interval is None:
+            interval = float(config.get('oc_server_log_tail_interval', 0.5))
+        self.interval = interval
+        self.scanner = _StepScanner(patterns)
+        self._stop_event = threading.Event()
+        self._process = None
+        self._lock = threading.Lock()  # the remote process is started and looked up by stop() under this lock
+
+    def _step(self):
+        try:
+            return self.step_fn()
+        except Exception, x:
+            logger.debug('cannot get the current step: %s', x)
+            return None
+
+    def run(self):
+        try:
+            if _is_local():
+                self._follow_local()
+            else:
+                self._follow_remote()
+        except Exception, x:
+            logger.warning('server log tailer failed: %s', x)
+
+    def _follow_local(self):
+        f = None
+        pos = self.offset
+        while True:
+            stopping = self._stop_event.is_set()
+            if f is None:
+                try:
+                    f = open(server_log_path(), 'rb')
+                    f.seek(pos)
+                except IOError:
+                    f = None
+            if f is not None:
+                if os.path.getsize(server_log_path()) < pos:  # rotated or truncated
+                    logger.info('server log rotated, following from the beginning')
+                    f.close()
+                    f, pos = None, 0
+                    continue
+                while True:
+                    data = f.read(READ_SIZE)
+                    if not data:
+                        break
+                    pos += len(data)
+                    self.scanner.feed_step(data, self._step())
+            if stopping:
+                break
+            self._stop_event.wait(self.interval)
+        if f is not None:
+            f.close()
+
+    def _follow_remote(self):
+        cmd = 'exec %s tail -c +%d -F %s' % (log_shell_cmd(), self.offset+1, server_log_path())
+        with self._lock:
+            if self._stop_event.is_set():  # stopped before the process was started
+                return
+            logger.info('running %s', repr(cmd))
+            self._process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
+        fd = self._process.stdout.fileno()
+        while True:
+            data = os.read(fd, READ_SIZE)
+            if not data:
+                break
+            self.scanner.feed_step(data, self._step())
+        self._process.wait()
+
+    def stop(self):
+        """ Read what is left in the log, stop the thread and return the results:
+        {'per_step': {step: {'patterns': {pattern: count}, 'warnings': N, 'errors': N, 'fatals': N}}, 'matches': [...]}
+        """
+        self._stop_event.set()
+        with self._lock:
+            process = self._process
+        if process is not None:
+            time.sleep(self.interval)  # let the last records of the remote log arrive
+            try:
+                process.terminate()
+            except OSError:
+                pass
+        self.join()
+        self.scanner.finish()
+        return {'per_step': self.scanner.per_step, 'matches': self.scanner.matches}
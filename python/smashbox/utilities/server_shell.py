@@ -0,0 +1,180 @@
+
+from smashbox.utilities import *
+
+# persistent command channel to the server host
+#
+# instead of a new ssh connection (oc_server_shell_cmd) for every server-side command, one remote shell is started
+# per process (oc_server_shell_cmd sh) and the commands are written to its stdin; the output of each command is
+# delimited by a marker line carrying its exit code; each command runs in a subshell of the channel shell
+#
+# with an empty oc_server_shell_cmd (server on localhost, or the tests of the helpers) a local sh is the channel
+#
+# the behaviour is controlled by these config options:
+#
+#  oc_server_shell_persistent : use the persistent channel; if False every command runs in a new shell (default True)
+
+import threading
+import uuid
+
+READ_SIZE = 1024*1024
+
+_channels = {}  # shell_cmd -> Channel (of this process)
+_channels_lock = threading.Lock()
+_channels_pid = None
+
+
+class Channel:
+    """ A shell on the server (shell_cmd + ' sh', or a local sh if shell_cmd is empty) which runs the commands one
+    at a time. The stderr of the commands is merged with their stdout.
+    """
+
+    def __init__(self, shell_cmd):
+        self.shell_cmd = shell_cmd.strip()
+        self.lock = threading.Lock()
+        self.process = None
+        self.marker = '__SMASH_END_%s' % uuid.uuid4().hex
+        self.stats = {'ncommands': 0, 'total': 0.0, 'max': 0.0, 'connect': None, 'nconnects': 0}
+
+    def _open(self):
+        cmd = 'exec sh'
+        if self.shell_cmd:
+            cmd = 'exec %s sh' % self.shell_cmd
+        t0 = time.time()
+        self.process = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._buf = ''
+        # the first command completes when the connection is established
+        self.process.stdin.write('true; printf "\\n%%s %%d\\n" "%s" $?\n' % self.marker)
+        self.process.stdin.flush()
+        for chunk in self._read_until_marker():
+            pass
+        self.stats['connect'] = time.time() - t0
+        self.stats['nconnects'] += 1
+        logger.info('server shell channel %s opened in %.3fs', repr(cmd), self.stats['connect'])
+
+    def _read_until_marker(self):
+        """ Yield the output until the marker line and set self.rc.
+        """
+        fd = self.process.stdout.fileno()
+        end = '\n' + self.marker + ' '
+        while True:
+            i = self._buf.find(end)
+            if i >= 0:
+                j = self._buf.find('\n', i+len(end))
+                if j >= 0:
+                    if i:
+                        yield self._buf[:i]
+                    self.rc = int(self._buf[i+len(end):j])
+                    self._buf = self._buf[j+1:]
+                    return
+            else:
+                # keep the tail which may be the beginning of the marker
+                n = len(self._buf) - len(end)
+                if n > 0:
+                    yield self._buf[:n]
+                    self._buf = self._buf[n:]
+            data = os.read(fd, READ_SIZE)
+            if not data:
+                self.close()
+                raise IOError('server shell channel %s closed' % repr(self.shell_cmd))
+            self._buf += data
+
+    def stream(self, cmd, input=None):
+        """ Run cmd in the channel and yield its output in chunks; the exit code is self.rc when the generator ends.
+        The optional input (string) is passed to the stdin of the command.
+        """
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._open()
+
+            # the command runs in a subshell: an exit, cd or variable of the command does not affect the channel
+            if input is None:
+                script = '( %s\n) </dev/null 2>&1; printf "\\n%%s %%d\\n" "%s" $?\n' % (cmd, self.marker)
+            else:
+                eof = '__SMASH_EOF_%s' % uuid.uuid4().hex
+                if not input.endswith('\n'):
+                    input += '\n'
+                script = "( %s\n) 2>&1 <<'%s'\n%s%s\nprintf \"\\n%%s %%d\\n\" \"%s\" $?\n" % (cmd, eof, input, eof, self.marker)
+
+            t0 = time.time()
+            self.process.stdin.write(script)
+            self.process.stdin.flush()
+            try:
+                for chunk in self._read_until_marker():
+                    yield chunk
+            except GeneratorExit:
+                # the rest of the output was not read: the channel cannot be reused
+                self.close(kill=True)
+                raise
+            elapsed = time.time() - t0
+
+            self.stats['ncommands'] += 1
+            self.stats['total'] += elapsed
+            self.stats['max'] = max(self.stats['max'], elapsed)
+            logger.info('server shell: %s (rc=%d) %.3fs', repr(cmd), self.rc, elapsed)
+
+    def run(self, cmd, input=None):
+        """ Run cmd in the channel and return (rc, output).
+        """
+        output = ''.join(self.stream(cmd, input))
+        return self.rc, output
+
+    def close(self, kill=False):
+        if self.process is not None:
+            if kill:
+                try:
+                    self.process.kill()
+                except OSError:
+                    pass
+            try:
+                self.process.stdin.close()
+            except IOError:
+                pass
+            self.process.wait()
+            self.process = None
+
+
+def get_channel(shell_cmd=None):
+    """ Return the channel of this process to the server (by default through config.oc_server_shell_cmd).
+    """
+    global _channels_pid
+
+    if shell_cmd is None:
+        shell_cmd = config.oc_server_shell_cmd
+
+    with _channels_lock:
+        if _channels_pid != os.getpid():  # do not share the channels with the forking parent
+            _channels.clear()
+            _channels_pid = os.getpid()
+        if shell_cmd not in _channels:
+            _channels[shell_cmd] = Channel(shell_cmd)
+        return _channels[shell_cmd]
+
+
+def run(cmd, shell_cmd=None, input=None):
+    """ Run cmd on the server (through shell_cmd, by default config.oc_server_shell_cmd) and return (rc, output).
+    The stderr of the command is merged with the output.
+    """
+    if shell_cmd is None:
+        shell_cmd = config.oc_server_shell_cmd
+
+    if config.get('oc_server_shell_persistent', True):
+        return get_channel(shell_cmd).run(cmd, input)
+
+    t0 = time.time()
+    process = subprocess.Popen('%s %s' % (shell_cmd, cmd), shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.communicate(input)[0]
+    logger.info('server shell: %s (rc=%d) %.3fs', repr(cmd), process.returncode, time.time()-t0)
+    return process.returncode, output
+
+
+def channel_stats():
+    """ Return the latency statistics of the channels of this process: {shell_cmd: {'ncommands', 'total', 'max',
+    'mean', 'connect', 'nconnects'}} (seconds).
+    """
+    with _channels_lock:
+        stats = {}
+        for shell_cmd, channel in _channels.items():
+            s = dict(channel.stats)
+            s['mean'] = s['total']/s['ncommands'] if s['ncommands'] else None
+            stats[shell_cmd] = s
+        return stats
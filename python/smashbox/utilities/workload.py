@@ -0,0 +1,223 @@
+
+from smashbox.utilities import *
+
+# reproducible sampling of the file sizes of the workload
+#
+# every worker draws the sizes from its own random stream seeded with a seed derived from the run seed
+# (config.workload_seed, drawn by setup_test() if not set) and the name and number of the worker: the workers forked
+# from the same process do not generate the same sizes and a run may be reproduced by setting workload_seed
+#
+# the sizes are drawn in batches (vectorized with numpy if it is available) and the seed and the histogram of the
+# sizes used by each worker are recorded as the 'workload' result at the end of the worker
+#
+# a size specification is:
+#
+#  (mean, sigma)                                                    : 10^x bytes where x is gaussian (lognormal)
+#  {'distribution': 'lognormal', 'mean': 3.5, 'sigma': 1.37}        : the same
+#  {'distribution': 'pareto', 'alpha': 1.2, 'xmin': 1000}           : pareto with the shape alpha and minimum xmin
+#  {'distribution': 'empirical', 'bins': [[lo, hi, weight], ...]}   : a bin is chosen with its weight and the size
+#                                                                     is uniform in [lo, hi)
+#
+# the sizes are at least 10 bytes and at most config.hashfile_maxsize (if set)
+#
+# the behaviour is controlled by these config options:
+#
+#  workload_seed  : the seed of the run (integer), None means random (default None)
+#  workload_batch : number of sizes drawn at once (default 1000)
+
+import bisect
+import hashlib
+import math
+import random
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MIN_SIZE = 10
+
+_samplers = {}  # repr(spec) -> Sampler (of this process)
+_samplers_pid = None
+
+
+def new_run_seed():
+    return struct.unpack('<Q', os.urandom(8))[0]
+
+
+def setup_run_seed():
+    """ Draw the seed of the run unless config.workload_seed is set (before the workers are forked) and record it.
+    """
+    if config.get('workload_seed', None) is None:
+        config.workload_seed = new_run_seed()
+    config.workload_seed = int(config.workload_seed)  # a string if set with -o (the template default is None)
+    logger.info('workload_seed = %d', config.workload_seed)
+    record_result('workload_seed', config.workload_seed)
+
+
+def worker_seed(name=None, number=None, run_seed=None, stream=''):
+    """ The seed of the worker (by default the current one: its name and number, several workers may have the same
+    name) derived from the run seed (default config.workload_seed) and the name of the stream.
+    """
+    from smashbox.utilities import reflection
+
+    if run_seed is None:
+        run_seed = config.get('workload_seed', None)
+        if run_seed is None:
+            run_seed = config.workload_seed = new_run_seed()
+    if name is None and number is None:
+        try:
+            name, number = reflection.getProcessName(), reflection.getWorkerNumber()
+        except (NameError, AttributeError):  # not running inside the smashbox engine
+            pass
+    key = '%d:%s:%s:%s' % (int(run_seed), name, number, stream)
+    return struct.unpack('<Q', hashlib.md5(key).digest()[:8])[0]
+
+
+def _parse(spec):
+    """ Return the distribution of the size specification as a dict.
+    """
+    if isinstance(spec, dict):
+        spec = dict(spec)
+        spec.setdefault('distribution', 'lognormal')
+        if spec['distribution'] not in ['lognormal', 'pareto', 'empirical']:
+            raise ValueError('unknown size distribution %s' % repr(spec['distribution']))
+        return spec
+    mean, sigma = spec
+    return {'distribution': 'lognormal', 'mean': mean, 'sigma': sigma}
+
+
+class Sampler:
+    """ A random stream of sizes of the specification spec seeded with seed.
+    """
+
+    def __init__(self, spec, seed):
+        self.spec = spec
+        self.dist = _parse(spec)
+        self.seed = seed
+        if numpy is not None:
+            self._rng = numpy.random.RandomState([seed & 0xffffffff, seed >> 32])
+        else:
+            self._rng = random.Random(seed)
+        self._buffer = []
+        self.histogram = {}  # lower bound of the power of 2 bin -> number of sizes used
+        self.count = 0
+
+    def sample(self, n):
+        """ Draw n sizes at once and return them as a list.
+        """
+        if numpy is not None:
+            values = self._sample_numpy(n)
+        else:
+            values = self._sample_python(n)
+
+        maxsize = config.get('hashfile_maxsize', None)
+        result = []
+        for v in values:
+            v = max(MIN_SIZE, int(v))
+            if maxsize and v > maxsize:
+                v = maxsize
+            result.append(v)
+        return result
+
+    def _sample_numpy(self, n):
+        d, rng = self.dist, self._rng
+        if d['distribution'] == 'lognormal':
+            return numpy.power(10., rng.normal(d['mean'], d['sigma'], n))
+        if d['distribution'] == 'pareto':
+            return d['xmin']*(1+rng.pareto(d['alpha'], n))  # numpy draws the pareto II (lomax) distribution
+        bins = numpy.array(d['bins'], dtype=float)
+        i = rng.choice(len(bins), n, p=bins[:, 2]/bins[:, 2].sum())
+        return bins[i, 0] + rng.random_sample(n)*(bins[i, 1]-bins[i, 0])
+
+    def _sample_python(self, n):
+        d, rng = self.dist, self._rng
+        if d['distribution'] == 'lognormal':
+            return [math.pow(10, rng.gauss(d['mean'], d['sigma'])) for i in xrange(n)]
+        if d['distribution'] == 'pareto':
+            return [d['xmin']*rng.paretovariate(d['alpha']) for i in xrange(n)]
+        cumulative = []
+        total = 0.
+        for lo, hi, weight in d['bins']:
+            total += weight
+            cumulative.append(total)
+        result = []
+        for k in xrange(n):
+            lo, hi, weight = d['bins'][bisect.bisect_right(cumulative, rng.random()*total)]
+            result.append(lo + rng.random()*(hi-lo))
+        return result
+
+    def next(self):
+        """ Return the next size of the stream (drawn in batches of config.workload_batch).
+        """
+        if not self._buffer:
+            self._buffer = self.sample(int(config.get('workload_batch', 1000)))
+            self._buffer.reverse()
+        size = self._buffer.pop()
+        self._count(size)
+        return size
+
+    def take(self, n):
+        """ Return the next n sizes of the stream.
+        """
+        if len(self._buffer) < n:
+            more = self.sample(n-len(self._buffer))
+            more.reverse()
+            self._buffer = more + self._buffer  # the buffer is consumed from the end
+        sizes = self._buffer[-n:]
+        sizes.reverse()
+        del self._buffer[-n:]
+        for size in sizes:
+            self._count(size)
+        return sizes
+
+    def _count(self, size):
+        b = 1 << (size.bit_length()-1)
+        self.histogram[b] = self.histogram.get(b, 0) + 1
+        self.count += 1
+
+
+def get_sampler(spec):
+    """ Return the sampler of the size specification of this worker.
+    """
+    global _samplers_pid
+
+    if _samplers_pid != os.getpid():  # do not share the streams with the forking parent
+        _samplers.clear()
+        _samplers_pid = os.getpid()
+
+    key = repr(spec)
+    if key not in _samplers:
+        seed = worker_seed(stream=key)
+        _samplers[key] = Sampler(spec, seed)
+        logger.info('workload sampler %s seed %d (run seed %s, numpy %s)', key, seed, config.get('workload_seed', None),
+                    numpy is not None)
+    return _samplers[key]
+
+
+def next_size(spec):
+    """ Return the next size (bytes) of the specification in the stream of this worker.
+    """
+    return get_sampler(spec).next()
+
+
+def sample_sizes(spec, n):
+    """ Return the next n sizes (bytes) of the specification in the stream of this worker, drawn at once.
+    """
+    return get_sampler(spec).take(n)
+
+
+def record_workload():
+    """ Record the seeds and the histograms of the sizes used by this worker as the 'workload' result.
+    """
+    if _samplers_pid != os.getpid():
+        return
+
+    for key, sampler in sorted(_samplers.items()):
+        if not sampler.count:
+            continue
+        histogram = [[b, sampler.histogram[b]] for b in sorted(sampler.histogram)]
+        logger.info('workload %s: %d sizes, seed %d, histogram %s', key, sampler.count, sampler.seed, histogram)
+        record_result('workload', {'spec': key, 'run_seed': config.get('workload_seed', None), 'seed': sampler.seed,
+                                   'count': sampler.count, 'histogram': histogram})
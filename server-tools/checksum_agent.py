@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#
+# Compute the checksums of many files on the owncloud server in one invocation.
+#
+# License: AGPL
+#
+# To be placed and run on the owncloud application server (python 2.6+ or 3):
+#
+#  python checksum_agent.py [--base DATADIRECTORY] [--workers N] [--algorithm md5 ...] < request.json
+#
+# The algorithms are the hashlib algorithms and the zlib checksums adler32 and crc32 (8 hex digits).
+#
+# The request is a json list of paths (relative to the base directory, shell wildcards allowed).
+# The reply is a json object printed on stdout:
+#
+#  {"files": [{"path": P, "size": N, "md5": HEX} or {"path": P, "error": MESSAGE}, ...], "elapsed": SECONDS}
+#
+# The files matching a wildcard are listed in sorted order (directories are skipped). A wildcard matching nothing
+# yields no entries.
+#
+
+import glob
+import hashlib
+import json
+import optparse
+import os
+import sys
+import threading
+import time
+import zlib
+
+READ_SIZE = 4*1024*1024
+
+
+class ZlibChecksum:
+
+    def __init__(self, func, value):
+        self.func = func
+        self.value = value
+
+    def update(self, data):
+        self.value = self.func(data, self.value)
+
+    def hexdigest(self):
+        return '%08x' % (self.value & 0xffffffff)
+
+
+def new_hash(algorithm):
+    if algorithm == 'adler32':
+        return ZlibChecksum(zlib.adler32, 1)
+    if algorithm == 'crc32':
+        return ZlibChecksum(zlib.crc32, 0)
+    return hashlib.new(algorithm)
+
+
+def hash_file(fn, algorithms):
+    hashes = [new_hash(a) for a in algorithms]
+    f = open(fn, 'rb')
+    try:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            for h in hashes:
+                h.update(chunk)
+    finally:
+        f.close()
+    return [h.hexdigest() for h in hashes]
+
+
+def expand(base, paths):
+    files = []
+    for p in paths:
+        full = os.path.join(base, p.lstrip('/'))
+        if glob.has_magic(full):
+            files += [(os.path.relpath(fn, base), fn) for fn in sorted(glob.glob(full)) if not os.path.isdir(fn)]
+        else:
+            files.append((p, full))
+    return files
+
+
+def checksum_files(base, paths, algorithms, workers):
+    files = expand(base, paths)
+    results = [None]*len(files)
+    lock = threading.Lock()
+    todo = list(range(len(files)))
+
+    def work():
+        while True:
+            lock.acquire()
+            try:
+                if not todo:
+                    return
+                i = todo.pop()
+            finally:
+                lock.release()
+            path, fn = files[i]
+            r = {'path': path}
+            try:
+                r['size'] = os.path.getsize(fn)
+                for a, digest in zip(algorithms, hash_file(fn, algorithms)):
+                    r[a] = digest
+            except (IOError, OSError):
+                r['error'] = str(sys.exc_info()[1])
+            results[i] = r
+
+    threads = [threading.Thread(target=work) for i in range(max(1, min(workers, len(files))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] < request.json')
+    parser.add_option('--base', default='.', help='directory of the relative paths (the owncloud data directory)')
+    parser.add_option('--workers', type='int', default=8, help='number of files hashed in parallel')
+    parser.add_option('--algorithm', action='append', dest='algorithms', help='hashlib algorithm, adler32 or crc32 (default md5), may be repeated')
+    opts, args = parser.parse_args()
+
+    paths = json.load(sys.stdin)
+    if not isinstance(paths, list):
+        parser.error('the request must be a json list of paths')
+
+    t0 = time.time()
+    files = checksum_files(opts.base, paths, opts.algorithms or ['md5'], opts.workers)
+    json.dump({'files': files, 'elapsed': time.time()-t0}, sys.stdout)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# common setup of the unit tests of the smashbox utilities
+#
+# the tests run outside of the smashbox engine: the config is the default (empty) configuration and the logger,
+# which the engine normally sets, is set here before the utilities modules are imported
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python'))
+
+from smashbox.script import config, getLogger
+
+import smashbox.utilities
+
+smashbox.utilities.logger = getLogger('test', logging.WARNING)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def make_rundir(testcase):
+    """ Set config.rundir to a new temporary directory which is removed when the test ends.
+    """
+    d = tempfile.mkdtemp(prefix='smashbox-test-')
+    testcase.addCleanup(shutil.rmtree, d, True)
+    set_config(testcase, rundir=d)
+    return d
+
+
+def set_config(testcase, **options):
+    """ Set the config options for the duration of the test.
+    """
+    for name, value in options.items():
+        if hasattr(config, name):
+            testcase.addCleanup(setattr, config, name, getattr(config, name))
+        else:
+            testcase.addCleanup(delattr, config, name)
+        setattr(config, name, value)
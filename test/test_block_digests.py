@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import os
+import unittest
+
+import common
+
+from smashbox.utilities import block_digests, seeded_content
+
+BS = 1024
+
+
+def digests(data, size=BS):
+    return [hashlib.md5(data[i:i+size]).hexdigest()[:block_digests.DIGEST_SIZE*2] for i in range(0, len(data), size)]
+
+
+class BlockHasherTest(unittest.TestCase):
+
+    def test_chunks(self):
+        data = ''.join(seeded_content.generate(1, 0, 10*BS+100))
+        for chunk_size in [1000, BS, 5000, len(data)]:
+            hasher = block_digests.BlockHasher([4*BS, BS])
+            for i in range(0, len(data), chunk_size):
+                hasher.update(data[i:i+chunk_size])
+            self.assertEqual(hasher.nbytes, len(data))
+            self.assertEqual(hasher.digests(), {BS: digests(data), 4*BS: digests(data, 4*BS)})
+
+
+class CompareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = ''.join(seeded_content.generate(1, 0, 8*BS))
+
+    def compare(self, observed):
+        return block_digests.compare(digests(self.data), digests(observed), BS, len(self.data), len(observed))
+
+    def test_same(self):
+        self.assertEqual(self.compare(self.data), [])
+
+    def test_wrong(self):
+        observed = self.data[:2*BS] + '\0'*(2*BS) + self.data[4*BS:]
+        self.assertEqual(self.compare(observed), [('wrong', 2*BS, 4*BS, None), ('missing', 2*BS, 4*BS, None)])
+
+    def test_shifted(self):
+        # blocks 2 and 3 swapped
+        observed = self.data[:2*BS] + self.data[3*BS:4*BS] + self.data[2*BS:3*BS] + self.data[4*BS:]
+        self.assertEqual(self.compare(observed), [('shifted', 2*BS, 3*BS, 3*BS), ('shifted', 3*BS, 4*BS, 2*BS)])
+
+    def test_duplicated(self):
+        observed = self.data[:5*BS] + self.data[:BS] + self.data[6*BS:]
+        self.assertEqual(self.compare(observed), [('duplicated', 5*BS, 6*BS, 0), ('missing', 5*BS, 6*BS, None)])
+
+    def test_truncated_and_extended(self):
+        self.assertEqual(self.compare(self.data[:6*BS+10]), [('wrong', 6*BS, 6*BS+10, None),
+                                                             ('missing', 6*BS, 8*BS, None)])
+        self.assertEqual(self.compare(self.data + 'x'*100), [('extra', 8*BS, 8*BS+100, None)])
+
+
+class SidecarTest(unittest.TestCase):
+
+    def setUp(self):
+        common.make_rundir(self)
+        self.data = ''.join(seeded_content.generate(2, 0, 3*BS+10))
+        self.md5 = hashlib.md5(self.data).hexdigest()
+        hasher = block_digests.BlockHasher([BS])
+        hasher.update(self.data)
+        block_digests.save(self.md5, hasher)
+
+    def test_save_load(self):
+        self.assertEqual(block_digests.load(self.md5), (len(self.data), {BS: digests(self.data)}))
+        self.assertEqual(block_digests.load('0'*32), None)
+
+    def test_truncated_sidecar(self):
+        fn = block_digests.sidecar_path(self.md5)
+        open(fn, 'r+b').truncate(os.path.getsize(fn)//2)
+        logging.disable(logging.WARNING)
+        try:
+            self.assertEqual(block_digests.load(self.md5), None)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_localize(self):
+        fn = os.path.join(common.config.rundir, 'f')
+        open(fn, 'wb').write(self.data[:BS] + '\0'*10 + self.data[BS+10:])
+        self.assertEqual(block_digests.localize(fn, self.md5), {BS: [('wrong', BS, 2*BS, None),
+                                                                     ('missing', BS, 2*BS, None)]})
+        self.assertEqual(block_digests.format_ranges([('shifted', 0, 10, 20)]), 'shifted 0-10 (from 20)')
+
+
+if __name__ == '__main__':
+    unittest.main()
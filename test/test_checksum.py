@@ -0,0 +1,82 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import common
+
+from smashbox.utilities import checksum, hash_files
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_builtin(self):
+        for a in ['md5', 'sha1', 'sha256', 'sha512', 'adler32', 'crc32']:
+            self.assertTrue(a in checksum.algorithms())
+        self.assertEqual(checksum.hexdigest_length('md5'), 32)
+        self.assertEqual(checksum.hexdigest_length('adler32'), 8)
+        self.assertEqual(checksum.header_type('adler32'), 'Adler32')
+        self.assertEqual(checksum.from_header_type('ADLER32'), 'adler32')
+        self.assertEqual(checksum.from_header_type('nosuch'), None)
+
+    def test_zlib(self):
+        for a, func in [('adler32', zlib.adler32), ('crc32', zlib.crc32)]:
+            h = checksum.new(a)
+            h.update('hello ')
+            h.update(memoryview('world'))
+            self.assertEqual(h.hexdigest(), '%08x' % (func('hello world') & 0xffffffff))
+
+    def test_register(self):
+        self.addCleanup(checksum._algorithms.pop, 'md5x2', None)
+        checksum.register('md5x2', lambda: hashlib.md5('x'), 32, 'MD5X2')
+        self.assertTrue('md5x2' in checksum.algorithms())
+        self.assertEqual(checksum.new('md5x2').hexdigest(), hashlib.md5('x').hexdigest())
+        self.assertEqual(checksum.from_header_type('md5x2'), 'md5x2')
+
+    def test_hashlib_fallback(self):
+        self.assertEqual(checksum.new('sha224').hexdigest(), hashlib.sha224().hexdigest())
+        self.assertEqual(checksum.hexdigest_length('sha224'), 56)
+
+
+class FileDigestsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        common.set_config(self, checksum_read_size=64*1024, checksum_segment_size=1024*1024)
+        checksum.clear_cache()
+        self.data = os.urandom(300*1024)
+        self.fn = os.path.join(self.dir, 'f')
+        open(self.fn, 'wb').write(self.data)
+
+    def test_file_digests(self):
+        digests = checksum.file_digests(self.fn, ['md5', 'sha1', 'adler32'])
+        self.assertEqual(digests, {'md5': hashlib.md5(self.data).hexdigest(),
+                                   'sha1': hashlib.sha1(self.data).hexdigest(),
+                                   'adler32': '%08x' % (zlib.adler32(self.data) & 0xffffffff)})
+
+    def test_cache(self):
+        checksum.file_digest(self.fn)
+        hits = checksum.cache_stats()['hits']
+        self.assertEqual(checksum.file_digest(self.fn), hashlib.md5(self.data).hexdigest())
+        self.assertEqual(checksum.cache_stats()['hits'], hits+1)
+        open(self.fn, 'ab').write('more')
+        self.assertEqual(checksum.file_digest(self.fn), hashlib.md5(self.data+'more').hexdigest())
+
+
+class HashfileNameTest(unittest.TestCase):
+
+    def test_name_round_trip(self):
+        filemask = 'x-{adler32}-{md5}'
+        self.assertEqual(sorted(hash_files._filemask_algorithms(filemask)), ['adler32', 'md5'])
+        checksums = {'md5': '0123456789abcdef0123456789abcdef', 'adler32': '0a0b0c0d'}
+        name = hash_files._hashfile_name(filemask, checksums)
+        self.assertEqual(name, 'x-0a0b0c0d-0123456789abcdef0123456789abcdef')
+        m = hash_files._name_pattern(filemask).match(name)
+        self.assertEqual(hash_files._name_checksums(m), checksums)
+
+
+if __name__ == '__main__':
+    unittest.main()
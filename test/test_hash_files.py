@@ -0,0 +1,93 @@
+import logging
+import os
+import unittest
+
+import common
+
+from smashbox.utilities import hash_files, seeded_content
+
+
+class SlowWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = common.make_rundir(self)
+        self.sleeps = []
+        self.addCleanup(setattr, hash_files.time, 'sleep', hash_files.time.sleep)
+        hash_files.time.sleep = self.sleeps.append
+
+    def test_paced_on_blocks(self):
+        # the seeded content is generated in whole pages: the blocks of 1000 bytes are paced anyway
+        fn, md5 = hash_files._write_hashfile(self.dir, '{md5}-{seed}', 10500, 1000, 0.01)
+        self.assertEqual(self.sleeps, [0.01]*10)
+        self.assertEqual(os.path.getsize(fn), 10500)
+        self.assertEqual(hash_files.md5sum(fn), md5)
+
+    def test_random_content(self):
+        fn, md5 = hash_files._write_hashfile(self.dir, '{md5}', 10500, 1000, 0.01)
+        self.assertEqual(len(self.sleeps), 10)
+        self.assertEqual(hash_files.md5sum(fn), md5)
+
+
+class ReportCorruptedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = common.make_rundir(self)
+        common.set_config(self, hashfile_block_digests=True, hashfile_block_sizes=[1024])
+
+    def report(self, fn, md5):
+        m = hash_files._name_pattern('{md5}-{seed}').match(os.path.basename(fn))
+        errors = common.smashbox.utilities.reported_errors
+        n = len(errors)
+        logging.disable(logging.ERROR)  # the reported error is expected
+        try:
+            hash_files._report_corrupted(fn, m, {'md5': md5}, {'md5': hash_files.md5sum(fn)})
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertEqual(len(errors), n+1)
+        return errors.pop()
+
+    def test_truncated(self):
+        fn, md5 = hash_files._write_hashfile(self.dir, '{md5}-{seed}', 10500)
+        open(fn, 'r+b').truncate(7000)
+        message = self.report(fn, md5)
+        self.assertTrue('(expected size=10500)' in message, message)
+        self.assertTrue('content matches the seed up to offset 7000 (truncated)' in message, message)
+        self.assertTrue('missing 6144-10500' in message, message)
+
+    def test_corrupted_byte(self):
+        fn, md5 = hash_files._write_hashfile(self.dir, '{md5}-{seed}', 10500)
+        f = open(fn, 'r+b')
+        f.seek(5000)
+        f.write('\0')
+        f.close()
+        message = self.report(fn, md5)
+        self.assertTrue('first corrupted byte at offset 5000' in message, message)
+        self.assertTrue('wrong 4096-5120' in message, message)
+
+
+class TemporaryFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = common.make_rundir(self)
+
+    def test_tmp_name(self):
+        for i in range(100):
+            name = hash_files._tmp_name()
+            self.assertTrue(name.endswith('~'))
+            self.assertEqual(hash_files._name_pattern(None).match(name), None)
+
+    def test_failed_write(self):
+        # a write error (e.g. no space left on device) does not leave the temporary file behind
+        def chunks(n):
+            yield 'x'*100
+            raise IOError(28, 'No space left on device')
+        self.addCleanup(setattr, seeded_content, 'generate', seeded_content.generate)
+        seeded_content.generate = lambda seed, offset, nbytes, chunk_size: chunks(1)
+        common.set_config(self, ignored_files=[])
+        self.assertRaises(IOError, hash_files._write_hashfile, self.dir, '{md5}-{seed}', 1000)
+        self.assertEqual(os.listdir(self.dir), [])
+        self.assertEqual(hash_files.count_files(self.dir), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
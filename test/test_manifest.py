@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import common
+
+from smashbox.utilities import manifest
+
+
+def entry(size, mtime=1000., md5=None):
+    return ('f', size, mtime, md5)
+
+
+class DiffTest(unittest.TestCase):
+
+    def test_same(self):
+        old = {'a': entry(10), 'd': ('d', 0, None, None)}
+        d = manifest.diff(old, dict(old))
+        self.assertTrue(manifest.is_same(d))
+
+    def test_added_removed_modified(self):
+        old = {'a': entry(10), 'b': entry(20), 'c': entry(30)}
+        new = {'a': entry(11), 'c': entry(30, mtime=2000.), 'e': entry(50)}
+        d = manifest.diff(old, new)
+        self.assertEqual(d, {'added': ['e'], 'removed': ['b'], 'modified': ['a', 'c'], 'renamed': []})
+        self.assertEqual(manifest.diff(old, new, compare_mtime=False)['modified'], ['a'])
+
+    def test_rename_by_digest(self):
+        old = {'a': entry(10, 1., 'x'), 'b': entry(10, 1., 'y')}
+        new = {'b2': entry(10, 5., 'y'), 'a2': entry(10, 7., 'x')}
+        d = manifest.diff(old, new)
+        self.assertEqual(d['renamed'], [('a', 'a2'), ('b', 'b2')])
+        self.assertEqual((d['added'], d['removed']), ([], []))
+
+    def test_rename_by_size_and_mtime(self):
+        old = {'a': entry(10, 1.), 'b': entry(10, 2.)}
+        new = {'x/a': entry(10, 1.), 'x/b': entry(10, 2.)}
+        self.assertEqual(manifest.diff(old, new)['renamed'], [('a', 'x/a'), ('b', 'x/b')])
+
+    def test_ambiguous_rename(self):
+        # two removed files with the same content: the added file is not paired with either of them
+        old = {'a': entry(10, 1., 'x'), 'b': entry(10, 1., 'x')}
+        new = {'c': entry(10, 1., 'x')}
+        d = manifest.diff(old, new)
+        self.assertEqual(d, {'added': ['c'], 'removed': ['a', 'b'], 'modified': [], 'renamed': []})
+
+    def test_directories_are_not_renamed(self):
+        old = {'d1': ('d', 0, None, None)}
+        new = {'d2': ('d', 0, None, None)}
+        d = manifest.diff(old, new)
+        self.assertEqual((d['added'], d['removed'], d['renamed']), (['d2'], ['d1'], []))
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.top = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.top)
+        common.set_config(self, ignored_files=['.csync_journal.db'])
+
+    def test_snapshot(self):
+        os.mkdir(os.path.join(self.top, 'd'))
+        open(os.path.join(self.top, 'd', 'f'), 'w').write('hello')
+        open(os.path.join(self.top, '.csync_journal.db'), 'w').write('x')
+        os.symlink('d/f', os.path.join(self.top, 'l'))
+        m = manifest.snapshot(self.top, digest=True)
+        self.assertEqual(sorted(m.keys()), ['d', 'd/f', 'l'])
+        self.assertEqual(m['d/f'][:2], ('f', 5))
+        self.assertEqual(m['d/f'][3], '5d41402abc4b2a76b9719d911017c592')
+        self.assertEqual(m['l'][0], 'l')
+
+    def test_save_load(self):
+        open(os.path.join(self.top, 'f'), 'w').write('hello')
+        m = manifest.snapshot(self.top)
+        fn = os.path.join(self.top, 'manifest.json')
+        manifest.save_manifest(m, fn)
+        self.assertTrue(manifest.is_same(manifest.diff(m, manifest.load_manifest(fn))))
+
+    def test_save_load_non_ascii(self):
+        open(os.path.join(self.top, 'caf\xc3\xa9.dat'), 'w').write('hello')
+        m = manifest.snapshot(self.top, digest=True)
+        fn = os.path.join(self.top, 'manifest.json')
+        manifest.save_manifest(m, fn)
+        loaded = manifest.load_manifest(fn)
+        self.assertEqual(loaded, m)
+        self.assertEqual([type(k) for k in loaded], [str])
+        self.assertTrue(manifest.is_same(manifest.diff(m, loaded)))
+
+
+if __name__ == '__main__':
+    unittest.main()
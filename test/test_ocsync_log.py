@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import common
+
+from smashbox.utilities import ocsync_log
+
+
+class ParseOcsyncLogTest(unittest.TestCase):
+
+    def test_client_1x(self):
+        m = ocsync_log.parse_ocsync_log(common.fixture('ocsync-1.x.log'))
+        self.assertEqual((m['files_up'], m['files_down'], m['files_other']), (1, 1, 1))
+        self.assertEqual((m['discovery_ms'], m['reconcile_ms'], m['propagation_ms']), (120, 15, 2500))
+        self.assertEqual((m['errors'], m['retries']), (1, 0))
+
+    def test_client_2x(self):
+        m = ocsync_log.parse_ocsync_log(common.fixture('ocsync-2.x.log'))
+        # a.dat is uploaded twice (before and after the restart) and counted once, b.dat failed (status 2)
+        self.assertEqual((m['files_up'], m['files_down'], m['files_other']), (1, 1, 1))
+        self.assertEqual((m['discovery_ms'], m['reconcile_ms'], m['propagation_ms']), (80, 5, 1200))
+        self.assertEqual((m['errors'], m['retries']), (2, 1))
+
+    def test_bytes_from_local_folder(self):
+        d = tempfile.mkdtemp()
+        self.addCleanup(common.shutil.rmtree, d)
+        open(os.path.join(d, 'a.dat'), 'w').write('x'*100)
+        open(os.path.join(d, 'd.dat'), 'w').write('x'*30)
+        m = ocsync_log.parse_ocsync_log(common.fixture('ocsync-2.x.log'), d)
+        self.assertEqual((m['bytes_up'], m['bytes_down']), (100, 30))
+
+    def test_missing_log(self):
+        self.assertEqual(ocsync_log.parse_ocsync_log('/nonexistent/ocsync.log'), ocsync_log.empty_metrics())
+
+    def test_throughput(self):
+        m = ocsync_log.empty_metrics()
+        m.update({'bytes_up': 3000000, 'bytes_down': 1000000, 'files_up': 3, 'files_down': 1})
+        ocsync_log.throughput(m, 2.)
+        self.assertEqual((m['mb_per_s'], m['files_per_s']), (2., 2.))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import common
+
+from smashbox.utilities import seeded_content
+
+SEED = 0x123456789abcdef0
+
+
+class SeededContentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, data):
+        fn = os.path.join(self.dir, 'f')
+        open(fn, 'wb').write(data)
+        return fn
+
+    def content(self, nbytes, seed=SEED):
+        return ''.join(seeded_content.generate(seed, 0, nbytes))
+
+    def test_generate_ranges(self):
+        data = self.content(100000)
+        self.assertEqual(len(data), 100000)
+        self.assertEqual(data, self.content(100000))
+        # any range may be regenerated on its own, in chunks of any size
+        self.assertEqual(''.join(seeded_content.generate(SEED, 5000, 30000, 1000)), data[5000:35000])
+        self.assertNotEqual(data, self.content(100000, SEED+1))
+
+    def test_pages_differ(self):
+        data = self.content(10*seeded_content.PAGE_SIZE)
+        pages = [data[i:i+seeded_content.PAGE_SIZE] for i in range(0, len(data), seeded_content.PAGE_SIZE)]
+        self.assertEqual(len(set(pages)), len(pages))
+
+    def test_first_mismatch(self):
+        data = self.content(50000)
+        self.assertEqual(seeded_content.first_mismatch(self.write(data), SEED, 50000), None)
+        self.assertEqual(seeded_content.first_mismatch(self.write(data[:20000]+'X'+data[20001:]), SEED), 20000)
+        self.assertEqual(seeded_content.first_mismatch(self.write(data), SEED, chunk_size=4096), None)
+
+    def test_first_mismatch_size(self):
+        data = self.content(50000)
+        # without the expected size a truncated or extended file which matches the seed is not detected
+        self.assertEqual(seeded_content.first_mismatch(self.write(data[:30000]), SEED), None)
+        self.assertEqual(seeded_content.first_mismatch(self.write(data[:30000]), SEED, 50000), 30000)
+        self.assertEqual(seeded_content.first_mismatch(self.write(data+'tail'), SEED, 50000), 50000)
+        self.assertEqual(seeded_content.first_mismatch(self.write(''), SEED, 50000), 0)
+
+    def test_format_seed(self):
+        self.assertEqual(seeded_content.format_seed(SEED), '123456789abcdef0')
+        self.assertEqual(int(seeded_content.format_seed(SEED), 16), SEED)
+
+
+if __name__ == '__main__':
+    unittest.main()
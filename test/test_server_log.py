@@ -0,0 +1,111 @@
+import unittest
+
+import common
+
+from smashbox.utilities import server_log
+
+PATTERNS = ["integrity constraint violation", "Exception", "could not obtain lock", "db error", "stat failed"]
+
+
+def feed_chunks(obj, data, size):
+    for i in range(0, len(data), size):
+        obj.feed(data[i:i+size])
+
+
+class LogScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = open(common.fixture('owncloud.log'), 'rb').read()
+
+    def scan(self, chunk_size):
+        scanner = server_log.LogScanner(PATTERNS)
+        feed_chunks(scanner, self.data, chunk_size)
+        return scanner, scanner.finish()
+
+    def test_counts(self):
+        scanner, results = self.scan(len(self.data))
+        counts = dict([(p, r['count']) for p, r in results.items()])
+        self.assertEqual(counts, {"integrity constraint violation": 1, "Exception": 1, "could not obtain lock": 1,
+                                  "db error": 1, "stat failed": 0})
+        self.assertEqual(scanner.nlines, 7)
+        self.assertEqual(scanner.nbytes, len(self.data))
+
+    def test_first_match(self):
+        scanner, results = self.scan(len(self.data))
+        first = results["db error"]['first']
+        self.assertEqual(first['line'], 5)
+        self.assertEqual(first['offset'], self.data.index('{"reqId":"r4"'))
+        self.assertTrue(first['text'].startswith('{"reqId":"r4"'))
+        self.assertEqual(results["stat failed"]['first'], None)
+
+    def test_chunks(self):
+        # the lines split between the chunks are scanned once
+        expected = self.scan(len(self.data))[1]
+        for chunk_size in [1, 7, 100]:
+            self.assertEqual(self.scan(chunk_size)[1], expected)
+
+    def test_incomplete_last_line(self):
+        scanner = server_log.LogScanner(["stat failed"])
+        scanner.feed('ok\nstat failed')
+        self.assertEqual(scanner.results()["stat failed"]['count'], 0)
+        self.assertEqual(scanner.finish()["stat failed"]['count'], 1)
+        self.assertEqual(scanner.nlines, 2)
+
+    def test_escaped_pattern(self):
+        scanner = server_log.LogScanner([r"\bLOCKED\b"])  # with an escape: matched with re.IGNORECASE
+        scanner.feed(self.data)
+        self.assertEqual(scanner.finish().values()[0]['count'], 1)
+
+
+class RequestAnalyzerTest(unittest.TestCase):
+
+    def analyse(self, chunk_size):
+        analyzer = server_log.RequestAnalyzer()
+        feed_chunks(analyzer, open(common.fixture('owncloud.log'), 'rb').read(), chunk_size)
+        return analyzer, analyzer.finish()
+
+    def test_endpoints(self):
+        analyzer, results = self.analyse(1000000)
+        self.assertEqual(sorted(results.keys()), ['GET /ocs/v1.php/cloud/users/{id}', 'MKCOL /remote.php/dav/files',
+                                                  'PROPFIND /remote.php/webdav', 'PUT /remote.php/webdav'])
+        self.assertEqual((analyzer.nrecords, analyzer.nskipped, len(analyzer.requests)), (6, 1, 5))
+
+    def test_errors_and_latencies(self):
+        results = self.analyse(1000000)[1]
+        put = results['PUT /remote.php/webdav']
+        self.assertEqual((put['requests'], put['errors'], put['error_rate'], put['timed']), (2, 1, 0.5, 1))
+        self.assertAlmostEqual(put['p50'], 0.25)  # the explicit durationMs
+        propfind = results['PROPFIND /remote.php/webdav']
+        self.assertAlmostEqual(propfind['max'], 0.5)  # the time span of the records of the request
+        self.assertEqual(results['GET /ocs/v1.php/cloud/users/{id}']['errors'], 1)
+        self.assertEqual(results['MKCOL /remote.php/dav/files']['errors'], 0)  # a warning
+        self.assertEqual(results['MKCOL /remote.php/dav/files']['p99'], None)
+
+    def test_chunks(self):
+        self.assertEqual(self.analyse(13)[1], self.analyse(1000000)[1])
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual([server_log.percentile(values, q) for q in [50, 90, 99, 100]], [50, 90, 99, 100])
+        self.assertEqual(server_log.percentile([], 50), None)
+
+
+class StepScannerTest(unittest.TestCase):
+
+    def test_levels_per_step(self):
+        data = open(common.fixture('owncloud.log'), 'rb').read()
+        scanner = server_log._StepScanner(PATTERNS)
+        split = data.index('"level":4') + 4  # the fatal record is split in its level field between the steps
+        scanner.feed_step(data[:split], 1)
+        scanner.feed_step(data[split:], 2)
+        scanner.finish()
+        # the record split between the chunks is counted once, in the step of its end
+        self.assertEqual(scanner.per_step[1], {'patterns': {"Exception": 1, "could not obtain lock": 1},
+                                               'warnings': 0, 'errors': 1, 'fatals': 0})
+        self.assertEqual(scanner.per_step[2], {'patterns': {"integrity constraint violation": 1, "db error": 1},
+                                               'warnings': 1, 'errors': 0, 'fatals': 1})
+        self.assertEqual([m['step'] for m in scanner.matches], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
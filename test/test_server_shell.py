@@ -0,0 +1,81 @@
+import unittest
+
+import common
+
+from smashbox.utilities import server_shell
+
+
+class ChannelTest(unittest.TestCase):
+    """ The channel with an empty oc_server_shell_cmd: a local sh.
+    """
+
+    def setUp(self):
+        common.set_config(self, oc_server_shell_cmd='', oc_server_shell_persistent=True)
+        self.channel = server_shell.Channel('')
+        self.addCleanup(self.channel.close)
+
+    def test_rc_and_output(self):
+        self.assertEqual(self.channel.run('echo hi'), (0, 'hi\n'))
+        self.assertEqual(self.channel.run('false'), (1, ''))
+        self.assertEqual(self.channel.run('printf x'), (0, 'x'))
+
+    def test_stderr_merged(self):
+        self.assertEqual(self.channel.run('echo out; echo err >&2'), (0, 'out\nerr\n'))
+
+    def test_exit(self):
+        self.assertEqual(self.channel.run('echo hi; echo err >&2; exit 3'), (3, 'hi\nerr\n'))
+        # the channel survives the exit of the command
+        self.assertEqual(self.channel.run('echo again'), (0, 'again\n'))
+        self.assertEqual(self.channel.stats['nconnects'], 1)
+
+    def test_input(self):
+        self.assertEqual(self.channel.run('cat', input='a\nb'), (0, 'a\nb\n'))
+        self.assertEqual(self.channel.run('read x; echo "[$x]"; cat', input="'$HOME'\n`x`\n"), (0, "['$HOME']\n`x`\n"))
+        self.assertEqual(self.channel.run('cat; exit 2', input='x\n'), (2, 'x\n'))
+        self.assertEqual(self.channel.run('echo next'), (0, 'next\n'))
+
+    def test_no_stdin(self):
+        # the command does not read the script of the channel
+        self.assertEqual(self.channel.run('cat'), (0, ''))
+        self.assertEqual(self.channel.run('echo ok'), (0, 'ok\n'))
+
+    def test_state_isolation(self):
+        self.channel.run('cd /; X=1; export Y=2; set -e')
+        self.assertNotEqual(self.channel.run('pwd')[1], '/\n')
+        self.assertEqual(self.channel.run('echo "[$X][$Y]"'), (0, '[][]\n'))
+        self.assertEqual(self.channel.run('false; echo still'), (0, 'still\n'))
+
+    def test_stream(self):
+        chunks = list(self.channel.stream('seq 1 100000'))
+        self.assertEqual(''.join(chunks), ''.join(['%d\n' % i for i in range(1, 100001)]))
+        self.assertEqual(self.channel.rc, 0)
+
+    def test_partial_stream(self):
+        # an abandoned stream closes the channel, the next command opens a new one
+        stream = self.channel.stream('seq 1 100000')
+        stream.next()
+        stream.close()
+        self.assertEqual(self.channel.run('echo ok'), (0, 'ok\n'))
+        self.assertEqual(self.channel.stats['nconnects'], 2)
+
+
+class RunTest(unittest.TestCase):
+
+    def setUp(self):
+        common.set_config(self, oc_server_shell_cmd='')
+
+    def test_persistent(self):
+        common.set_config(self, oc_server_shell_persistent=True)
+        self.addCleanup(server_shell.get_channel('').close)
+        self.assertEqual(server_shell.run('echo hi; exit 3'), (3, 'hi\n'))
+        self.assertEqual(server_shell.run('cat', input='x'), (0, 'x\n'))
+        self.assertTrue(server_shell.channel_stats()['']['ncommands'] >= 2)
+
+    def test_not_persistent(self):
+        common.set_config(self, oc_server_shell_persistent=False)
+        self.assertEqual(server_shell.run('echo hi; echo err >&2; exit 3'), (3, 'hi\nerr\n'))
+        self.assertEqual(server_shell.run('cat', input='x'), (0, 'x'))
+
+
+if __name__ == '__main__':
+    unittest.main()
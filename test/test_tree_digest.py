@@ -0,0 +1,107 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import common
+
+from smashbox.utilities import checksum
+
+SEGMENT = 128*1024
+
+
+def tree_digest(data, size=SEGMENT):
+    segments = [hashlib.md5(data[i:i+size]).digest() for i in range(0, len(data), size)] or [hashlib.md5().digest()]
+    return hashlib.md5(''.join(segments)).hexdigest()
+
+
+class TreeDigestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        common.set_config(self, checksum_read_size=64*1024, checksum_segment_size=SEGMENT)
+        checksum.clear_cache()
+
+    def write(self, data):
+        fn = os.path.join(self.dir, 'f%d' % len(data))
+        open(fn, 'wb').write(data)
+        return fn
+
+    def test_partial_last_segment(self):
+        data = os.urandom(2*SEGMENT + 1000)
+        fn = self.write(data)
+        self.assertEqual(checksum.tree_digest(fn, nworkers=3), tree_digest(data))
+        checksum.clear_cache()
+        self.assertEqual(checksum.tree_digest(fn, nworkers=1), tree_digest(data))
+
+    def test_multiple_of_segment(self):
+        # no empty last segment
+        data = os.urandom(3*SEGMENT)
+        self.assertEqual(checksum.tree_digest(self.write(data), nworkers=2), tree_digest(data))
+
+    def test_small_and_empty(self):
+        for data in ['', 'hello']:
+            self.assertEqual(checksum.tree_digest(self.write(data)), tree_digest(data))
+
+    def test_segment_size(self):
+        data = os.urandom(SEGMENT)
+        self.assertEqual(checksum.tree_digest(self.write(data), size=64*1024), tree_digest(data, 64*1024))
+
+    def test_cached(self):
+        data = os.urandom(SEGMENT + 10)
+        fn = self.write(data)
+        checksum.tree_digest(fn)
+        nbytes = checksum.cache_stats()['bytes']
+        self.assertEqual(checksum.tree_digest(fn), tree_digest(data))
+        self.assertEqual(checksum.cache_stats()['bytes'], nbytes)
+
+
+class ReadaheadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        common.set_config(self, checksum_read_size=64*1024, checksum_segment_size=SEGMENT)
+        checksum.clear_cache()
+
+    def test_file_digests(self):
+        # the files larger than a segment are read ahead, also an exact multiple of the read size
+        for n in [3*SEGMENT + 1000, 4*SEGMENT]:
+            data = os.urandom(n)
+            fn = os.path.join(self.dir, 'f%d' % n)
+            open(fn, 'wb').write(data)
+            self.assertEqual(checksum.file_digests(fn, ['md5', 'adler32']),
+                             {'md5': hashlib.md5(data).hexdigest(),
+                              'adler32': '%08x' % (zlib.adler32(data) & 0xffffffff)})
+
+    def test_hash_stream(self):
+        data = os.urandom(300*1024)
+        fn = os.path.join(self.dir, 'f')
+        open(fn, 'wb').write(data)
+        f = open(fn, 'rb')
+        self.addCleanup(f.close)
+        self.assertEqual(checksum.hash_stream(f, 'sha1', 1000, readahead=True), hashlib.sha1(data).hexdigest())
+
+    def test_read_error(self):
+        # the read error in the readahead thread is raised in the caller
+
+        class FailingFile:
+            def __init__(self):
+                self.nreads = 0
+
+            def readinto(self, buf):
+                self.nreads += 1
+                if self.nreads > 2:
+                    raise IOError(5, 'Input/output error')
+                buf[:] = 'x'*len(buf)
+                return len(buf)
+
+        h = hashlib.md5()
+        self.assertRaises(IOError, checksum._update_readahead, h, FailingFile(), 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
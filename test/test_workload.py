@@ -0,0 +1,81 @@
+import unittest
+
+import common
+
+from smashbox.utilities import workload
+
+SEED = 1234567890123
+
+
+class SamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        common.set_config(self, workload_batch=100)
+
+    def test_reproducible(self):
+        spec = (3.5, 1.37)
+        self.assertEqual(workload.Sampler(spec, SEED).take(500), workload.Sampler(spec, SEED).take(500))
+        self.assertNotEqual(workload.Sampler(spec, SEED).take(500), workload.Sampler(spec, SEED+1).take(500))
+
+    def test_next_and_take(self):
+        # the batches do not change the stream
+        a = workload.Sampler((3.5, 1.37), SEED)
+        b = workload.Sampler((3.5, 1.37), SEED)
+        self.assertEqual([a.next() for i in range(250)], b.take(50) + [b.next() for i in range(150)] + b.take(50))
+
+    def test_bounds(self):
+        common.set_config(self, hashfile_maxsize=100000)
+        sizes = workload.Sampler((3.5, 2.), SEED).take(2000)
+        self.assertEqual(min(sizes), workload.MIN_SIZE)
+        self.assertEqual(max(sizes), 100000)
+
+    def test_pareto(self):
+        sizes = workload.Sampler({'distribution': 'pareto', 'alpha': 1.2, 'xmin': 1000}, SEED).take(1000)
+        self.assertTrue(min(sizes) >= 1000)
+
+    def test_empirical(self):
+        spec = {'distribution': 'empirical', 'bins': [[100, 200, 1], [5000, 6000, 3], [70000, 70001, 0]]}
+        sizes = workload.Sampler(spec, SEED).take(1000)
+        self.assertTrue(all(100 <= s < 200 or 5000 <= s < 6000 for s in sizes))
+        n = len([s for s in sizes if s >= 5000])
+        self.assertTrue(650 < n < 850, n)
+
+    def test_unknown_distribution(self):
+        self.assertRaises(ValueError, workload.Sampler, {'distribution': 'uniform'}, SEED)
+
+    def test_histogram(self):
+        sampler = workload.Sampler({'distribution': 'empirical', 'bins': [[1024, 2048, 1], [5000, 6000, 1]]}, SEED)
+        sampler.take(100)
+        sampler.next()
+        self.assertEqual(sampler.count, 101)
+        self.assertEqual(sorted(sampler.histogram.keys()), [1024, 4096])
+        self.assertEqual(sum(sampler.histogram.values()), 101)
+
+
+class SeedTest(unittest.TestCase):
+
+    def setUp(self):
+        common.make_rundir(self)
+
+    def test_string_seed(self):
+        # workload_seed set with -o is a string
+        common.set_config(self, workload_seed='42')
+        workload.setup_run_seed()
+        self.assertEqual(common.config.workload_seed, 42)
+        self.assertEqual(workload.worker_seed('w', 0, '42'), workload.worker_seed('w', 0, 42))
+
+    def test_worker_seeds(self):
+        seeds = set([workload.worker_seed('worker', i, SEED) for i in range(10)])
+        seeds.add(workload.worker_seed('other', 0, SEED))
+        seeds.add(workload.worker_seed('worker', 0, SEED, 'stream'))
+        self.assertEqual(len(seeds), 12)
+        self.assertEqual(workload.worker_seed('worker', 3, SEED), workload.worker_seed('worker', 3, SEED))
+
+    def test_drawn_seed(self):
+        common.set_config(self, workload_seed=None)
+        workload.setup_run_seed()
+        self.assertTrue(isinstance(common.config.workload_seed, (int, long)))
+
+
+if __name__ == '__main__':
+    unittest.main()